@@ -0,0 +1,84 @@
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework import exceptions
+
+from .authentication import CachedTokenAuthentication
+from .exports import EXPORT_FORMATS, shopping_cart_ingredients
+
+
+def in_thread(func):
+    """
+    Превращает синхронную функцию в корутину, которая выполняется в
+    отдельном потоке пула. Цикл событий не блокируется, а работа с базой
+    не ждет общий поток sync_to_async. Соединения потока закрываются по
+    CONN_MAX_AGE.
+    """
+    def run(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False)
+
+
+def async_view(view):
+    """
+    Асинхронная обертка для представлений DRF: обработка запроса и
+    рендеринг ответа выполняются в отдельном потоке.
+    """
+    def render(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    render = in_thread(render)
+
+    async def wrapper(request, *args, **kwargs):
+        return await render(request, *args, **kwargs)
+
+    wrapper.csrf_exempt = True
+    return wrapper
+
+
+def export_chunks(user_id, file_format):
+    _, render = EXPORT_FORMATS[file_format]
+    return list(render(shopping_cart_ingredients(user_id).iterator()))
+
+
+async def download_shopping_cart(request):
+    """
+    Асинхронная выгрузка списка покупок. Файл собирается в отдельном
+    потоке и отдается частями, пока цикл событий обслуживает другие
+    запросы. В Django 3.2 потоковый ответ под ASGI перебирается
+    синхронно, поэтому запросы к базе выполняются до начала отдачи.
+    """
+    try:
+        authenticated = await in_thread(
+            CachedTokenAuthentication().authenticate)(request)
+    except exceptions.AuthenticationFailed as error:
+        authenticated = None
+        detail = error.detail
+    else:
+        detail = exceptions.NotAuthenticated.default_detail
+    if authenticated is None:
+        response = JsonResponse({'detail': detail}, status=401,
+                                json_dumps_params={'ensure_ascii': False})
+        response['WWW-Authenticate'] = 'Token'
+        return response
+    user, _ = authenticated
+
+    file_format = request.GET.get('file_format', 'txt')
+    if file_format not in EXPORT_FORMATS:
+        return JsonResponse(f'Неизвестный формат файла: {file_format}!',
+                            safe=False, status=400,
+                            json_dumps_params={'ensure_ascii': False})
+    chunks = await in_thread(export_chunks)(user.id, file_format)
+
+    content_type, _ = EXPORT_FORMATS[file_format]
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename="my_shopping_cart.{file_format}"')
+    return response
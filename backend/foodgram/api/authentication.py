@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .cache import auth_token_key, bump_version, get_version
+
+
+class LRUCache:
+    """Ограниченный по размеру кеш в памяти процесса с временем жизни."""
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = (time.monotonic() + self.timeout, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Аутентификация по токену с кешем: токен с пользователем хранится в
+    LRU процесса и, при TOKEN_CACHE_SHARED, в общем кеше. Записи
+    сверяются с версией токена, которая увеличивается при выходе,
+    сохранении (смене пароля, деактивации) и удалении пользователя.
+    Версия живет TOKEN_CACHE_TIMEOUT, как и записи: после ее истечения
+    или вытеснения токен снова проверяется по базе. Если общий кеш не
+    настроен, другие процессы узнают об изменениях не позже
+    TOKEN_CACHE_TIMEOUT.
+    """
+    local_cache = LRUCache(settings.TOKEN_CACHE_SIZE,
+                           settings.TOKEN_CACHE_TIMEOUT)
+
+    def authenticate_credentials(self, key):
+        # Версия только читается: ключи в кеше заводятся лишь для токенов,
+        # которые нашлись в базе. Без версии запись считается промахом.
+        version_name = auth_token_key(key)
+        version = get_version(version_name, create=False)
+        cache_key = f'{version_name}:{version}'
+        cached = None
+        if version is not None:
+            cached = self.local_cache.get(cache_key)
+            if cached is None and settings.TOKEN_CACHE_SHARED:
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    self.local_cache.set(cache_key, cached)
+        if cached is not None:
+            return cached.user, cached
+
+        model = self.get_model()
+        try:
+            token = model.objects.select_related('user').get(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                'User inactive or deleted.')
+
+        if version is None:
+            # Версия заводится после проверки, а токен кешируется со
+            # следующего запроса: версия, прочитанная до обращения к базе,
+            # гарантирует, что выход между ними не оставит токен в кеше.
+            get_version(version_name, timeout=settings.TOKEN_CACHE_TIMEOUT)
+            return token.user, token
+        self.local_cache.set(cache_key, token)
+        if settings.TOKEN_CACHE_SHARED:
+            cache.set(cache_key, token, settings.TOKEN_CACHE_TIMEOUT)
+        return token.user, token
+
+
+def invalidate_user_tokens(user_id):
+    """Сбрасывает закешированные токены пользователя."""
+    for key in Token.objects.filter(user_id=user_id).values_list(
+            'key', flat=True):
+        bump_version(auth_token_key(key))
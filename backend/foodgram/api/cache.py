@@ -0,0 +1,101 @@
+import hashlib
+import secrets
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+
+
+def new_version():
+    """
+    Начальная версия набора данных. Она случайна, поэтому версия,
+    вытесненная из кеша, не начинается заново с прежнего значения и
+    старые записи не становятся снова актуальными.
+    """
+    return secrets.randbits(62)
+
+
+def get_version(name, create=True, timeout=None):
+    """
+    Возвращает текущую версию набора данных для ключей кеша. Без create
+    отсутствующая версия не создается и возвращается None.
+    """
+    if not create:
+        return cache.get(f'version:{name}')
+    return cache.get_or_set(f'version:{name}', new_version, timeout=timeout)
+
+
+def get_last_modified(name):
+    """Возвращает время последнего изменения набора данных."""
+    return cache.get_or_set(f'modified:{name}', time.time, timeout=None)
+
+
+def bump_version(name):
+    """
+    Инвалидирует закешированные данные, увеличивая их версию. Если версии
+    в кеше нет, следующее чтение начнет новую случайную версию.
+    """
+    try:
+        cache.incr(f'version:{name}')
+    except ValueError:
+        pass
+    cache.set(f'modified:{name}', time.time(), timeout=None)
+
+
+def relations_key(user_id, name):
+    """Ключ версии множества связей пользователя."""
+    return f'relations:{name}:{user_id}'
+
+
+def auth_token_key(key):
+    """Ключ версии закешированного токена, сам токен в ключ не попадает."""
+    return f'auth_token:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+class CachedResponseMixin:
+    """
+    Миксин для справочных вьюсетов: кеширует готовый JSON ответов list и
+    retrieve до смены версии cache_version_name и отдает их с ETag и
+    Last-Modified, отвечая 304 на условные запросы.
+    """
+    cache_version_name = None
+
+    def cached_response(self, request, get_response):
+        if request.accepted_renderer.format != 'json':
+            return get_response()
+        name = self.cache_version_name
+        key = (f'response:{name}:{get_version(name)}:'
+               f'{request.get_full_path()}')
+        cached = cache.get(key)
+        if cached is None:
+            response = get_response()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            content = JSONRenderer().render(response.data)
+            cached = (f'"{hashlib.md5(content).hexdigest()}"',
+                      int(get_last_modified(name)), content)
+            cache.set(key, cached, settings.REFERENCE_CACHE_TIMEOUT)
+
+        etag, last_modified, content = cached
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = HttpResponse(content, content_type='application/json')
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, partial(super().list, request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, partial(super().retrieve, request, *args, **kwargs))
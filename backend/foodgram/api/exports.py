@@ -0,0 +1,86 @@
+import csv
+import io
+
+from django.conf import settings
+from django.db.models import F
+from recipes.models import ShoppingCartIngredient
+
+CHUNK_SIZE = 8192
+TITLE = 'Мой список покупок:'
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def ingredient_line(row_num, ingredient):
+    return (f'{row_num}: {ingredient.get("ingredient__name")} - '
+            f'{ingredient.get("total_amount")} '
+            f'{ingredient.get("ingredient__measurement_unit")}')
+
+
+def render_txt(ingredients):
+    yield f'{TITLE}\n'.encode()
+    for row_num, ingredient in enumerate(ingredients, start=1):
+        yield f'{ingredient_line(row_num, ingredient)}\n'.encode()
+
+
+def render_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield '\ufeff'.encode()
+    yield writer.writerow(('Ингредиент', 'Количество',
+                           'Единица измерения')).encode()
+    for ingredient in ingredients:
+        yield writer.writerow((
+            ingredient.get('ingredient__name'),
+            ingredient.get('total_amount'),
+            ingredient.get('ingredient__measurement_unit'),
+        )).encode()
+
+
+def render_pdf(ingredients):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+
+    pdfmetrics.registerFont(TTFont('ShoppingCart',
+                                   settings.SHOPPING_CART_PDF_FONT))
+    buffer = io.BytesIO()
+    page = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    top, bottom, left, line_height = height - 50, 50, 50, 18
+
+    page.setFont('ShoppingCart', 16)
+    page.drawString(left, top, TITLE)
+    y = top - 2 * line_height
+    page.setFont('ShoppingCart', 12)
+    for row_num, ingredient in enumerate(ingredients, start=1):
+        if y < bottom:
+            page.showPage()
+            page.setFont('ShoppingCart', 12)
+            y = top
+        page.drawString(left, y, ingredient_line(row_num, ingredient))
+        y -= line_height
+    page.save()
+
+    buffer.seek(0)
+    yield from iter(lambda: buffer.read(CHUNK_SIZE), b'')
+
+
+EXPORT_FORMATS = {
+    'txt': ('text/plain; charset=utf-8', render_txt),
+    'csv': ('text/csv; charset=utf-8', render_csv),
+    'pdf': ('application/pdf', render_pdf),
+}
+
+
+def shopping_cart_ingredients(user_id):
+    """Строки выгрузки: суммарные ингредиенты корзины по алфавиту."""
+    return ShoppingCartIngredient.objects.filter(user_id=user_id).annotate(
+        total_amount=F('amount')).values(
+        'ingredient__name', 'ingredient__measurement_unit',
+        'total_amount').order_by('ingredient__name')
@@ -0,0 +1,52 @@
+from django.db.models import Exists, OuterRef
+from django_filters.rest_framework import (BooleanFilter, CharFilter,
+                                           FilterSet,
+                                           ModelMultipleChoiceFilter)
+from recipes.models import FavoritesList, Recipe, ShoppingList, Tag
+
+from .search import search_recipes
+
+
+class RecipeFilter(FilterSet):
+    """
+    Кастомный фильтр для фильтрации во вьюсете рецепта.
+    Теги, избранное и корзина проверяются подзапросами EXISTS, поэтому
+    рецепты в выдаче не дублируются и DISTINCT не нужен. Параметр search
+    включает полнотекстовый поиск и аннотацию search_rank.
+    """
+    tags = ModelMultipleChoiceFilter(field_name='tags__slug',
+                                     to_field_name='slug',
+                                     queryset=Tag.objects.all(),
+                                     method='filter_tags', )
+
+    is_favorited = BooleanFilter(method='filter_is_favorited')
+    is_in_shopping_cart = BooleanFilter(method='filter_is_in_shopping_cart')
+    search = CharFilter(method='filter_search')
+
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'), tag__in=[tag.id for tag in value])))
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def filter_relation(self, queryset, model, value):
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset.none() if value else queryset
+        related = Exists(model.objects.filter(recipe=OuterRef('pk'),
+                                              user=user))
+        return queryset.filter(related if value else ~related)
+
+    def filter_is_favorited(self, queryset, name, value):
+        return self.filter_relation(queryset, FavoritesList, value)
+
+    def filter_is_in_shopping_cart(self, queryset, name, value):
+        return self.filter_relation(queryset, ShoppingList, value)
+
+    class Meta:
+        model = Recipe
+        fields = ['author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+                  'search', ]
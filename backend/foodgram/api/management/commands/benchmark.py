@@ -0,0 +1,164 @@
+import json
+import math
+import statistics
+import time
+import tracemalloc
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.utils import timezone
+from recipes.models import Ingredient, Recipe, ShoppingList, Tag
+from rest_framework.test import APIClient
+from users.models import Follow, User
+
+from api.middleware import QueryRecorder
+from api.pagination import KeysetPageNumberPagination
+from api.testing import percentile
+
+
+class Command(BaseCommand):
+    """Замер времени ответа основных эндпоинтов API."""
+    help = ('Запрашивает эндпоинты API через тестовый клиент и сохраняет '
+            'p50/p95 времени ответа, число запросов к базе и пиковую '
+            'память в JSON. Запускать на данных generate_dataset.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=30,
+            help='Количество замеров на эндпоинт.')
+        parser.add_argument(
+            '--warmup', type=int, default=3,
+            help='Количество прогревочных запросов на эндпоинт.')
+        parser.add_argument(
+            '--output', default=None,
+            help='Файл для сохранения результатов в JSON.')
+        parser.add_argument(
+            '--compare', default=None,
+            help='Файл с результатами прошлого запуска для сравнения.')
+        parser.add_argument(
+            '--label', default='',
+            help='Метка запуска, сохраняется в результатах.')
+
+    def endpoints(self):
+        user = User.objects.order_by('-followers_count').first()
+        reader = User.objects.filter(
+            id__in=ShoppingList.objects.values('user')).order_by(
+            '-id').first() or user
+        recipe = Recipe.objects.order_by('-favorites_count').first()
+        tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        ingredient = Ingredient.objects.order_by('id').first()
+        if not all((user, recipe, tags, ingredient)):
+            raise CommandError('Недостаточно данных, запустите '
+                               'generate_dataset.')
+        query = ingredient.name[:3]
+        owned = '&'.join(
+            f'ingredients={ingredient_id}' for ingredient_id in
+            recipe.ingredients.values_list('id', flat=True)[:5])
+        # Глубокая страница списка, но не дальше последней существующей.
+        deep_page = min(50, max(1, math.ceil(
+            Recipe.objects.count() / KeysetPageNumberPagination.page_size)))
+        return reader, (
+            ('recipes', '/api/recipes/', False),
+            ('recipes_auth', '/api/recipes/', True),
+            ('recipes_deep_page', f'/api/recipes/?page={deep_page}', True),
+            ('recipes_cursor', '/api/recipes/?pagination=cursor', True),
+            ('recipes_tags', f'/api/recipes/?tags={tags[0]}', True),
+            ('recipes_two_tags',
+             f'/api/recipes/?tags={tags[0]}&tags={tags[-1]}', True),
+            ('recipes_author', f'/api/recipes/?author={user.id}', True),
+            ('recipes_favorited', '/api/recipes/?is_favorited=1', True),
+            ('recipes_in_cart', '/api/recipes/?is_in_shopping_cart=1', True),
+            ('recipes_trending', '/api/recipes/?ordering=trending', True),
+            ('recipes_search', '/api/recipes/?search=Рецепт', True),
+            ('recipes_match', f'/api/recipes/match/?{owned}', False),
+            ('recipe_detail', f'/api/recipes/{recipe.id}/', True),
+            ('subscriptions',
+             '/api/users/subscriptions/?recipes_limit=3', True),
+            ('users', '/api/users/', True),
+            ('users_me', '/api/users/me/', True),
+            ('download_txt', '/api/recipes/download_shopping_cart/', True),
+            ('download_csv',
+             '/api/recipes/download_shopping_cart/?file_format=csv', True),
+            ('ingredients_search', f'/api/ingredients/?name={query}', False),
+            ('tags', '/api/tags/', False),
+        )
+
+    def request(self, client, url):
+        response = client.get(url)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        if response.status_code != 200:
+            raise CommandError(f'{url}: ответ {response.status_code}')
+
+    def measure(self, client, url, iterations, warmup):
+        for _ in range(warmup):
+            self.request(client, url)
+        timings, queries = [], []
+        for _ in range(iterations):
+            with QueryRecorder() as recorder:
+                started = time.perf_counter()
+                self.request(client, url)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(recorder.count)
+        tracemalloc.start()
+        self.request(client, url)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'mean_ms': round(statistics.mean(timings), 2),
+            'queries': max(queries),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('Нужен хотя бы один замер.')
+        reader, endpoints = self.endpoints()
+        previous = {}
+        if options['compare']:
+            with open(options['compare'], encoding='utf8') as source:
+                previous = json.load(source)['results']
+
+        results = {}
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for name, url, authenticated in endpoints:
+                client = APIClient()
+                if authenticated:
+                    client.force_authenticate(reader)
+                results[name] = {'url': url, **self.measure(
+                    client, url, options['iterations'], options['warmup'])}
+                self.report(name, results[name], previous.get(name))
+
+        report = {
+            'label': options['label'],
+            'created': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'iterations': options['iterations'],
+            'dataset': {
+                'users': User.objects.count(),
+                'follows': Follow.objects.count(),
+                'recipes': Recipe.objects.count(),
+                'ingredients': Ingredient.objects.count(),
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf8') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(
+                f'Результаты сохранены в {options["output"]}.'))
+
+    def report(self, name, result, previous):
+        line = (f'{name:<22} p50 {result["p50_ms"]:>8.2f} мс  '
+                f'p95 {result["p95_ms"]:>8.2f} мс  '
+                f'запросов {result["queries"]:>3}  '
+                f'память {result["peak_memory_kb"]:>8.1f} КБ')
+        if previous:
+            change = (result['p50_ms'] - previous['p50_ms']) / max(
+                previous['p50_ms'], 0.01) * 100
+            line += (f'  p50 {change:+.0f}%, запросов '
+                     f'{result["queries"] - previous["queries"]:+d}')
+        self.stdout.write(line)
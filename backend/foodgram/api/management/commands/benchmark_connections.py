@@ -0,0 +1,99 @@
+import json
+import time
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory, override_settings
+
+from api.testing import percentile
+
+
+class Command(BaseCommand):
+    """Замер накладных расходов на открытие соединений с базой."""
+    help = ('Выполняет запросы через WSGI-обработчик Django, как gunicorn, '
+            'сначала с CONN_MAX_AGE=0, затем с постоянными соединениями, и '
+            'сравнивает время ответа и число открытых соединений.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', default='/api/recipes/',
+            help='Адрес, который запрашивается в замере.')
+        parser.add_argument(
+            '--iterations', type=int, default=200,
+            help='Количество запросов в каждом режиме.')
+        parser.add_argument(
+            '--max-age', type=int, default=60,
+            help='CONN_MAX_AGE для режима постоянных соединений.')
+        parser.add_argument(
+            '--output', default=None,
+            help='Файл для сохранения результатов в JSON.')
+
+    def run(self, handler, environ, max_age, iterations):
+        for connection in connections.all():
+            connection.close()
+            connection.settings_dict['CONN_MAX_AGE'] = max_age
+        opened = []
+
+        def count_connection(sender, connection, **kwargs):
+            opened.append(connection.alias)
+
+        connection_created.connect(count_connection)
+        timings = []
+        try:
+            for _ in range(iterations):
+                started = time.perf_counter()
+                response = handler(dict(environ), lambda *args: None)
+                for _ in response:
+                    pass
+                response.close()
+                if response.status_code != 200:
+                    raise CommandError(f'Ответ {response.status_code}.')
+                timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            connection_created.disconnect(count_connection)
+        return {
+            'conn_max_age': max_age,
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'connections_opened': len(opened),
+        }
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('Нужен хотя бы один запрос.')
+        handler = WSGIHandler()
+        environ = RequestFactory()._base_environ(
+            PATH_INFO=options['url'].split('?')[0],
+            QUERY_STRING=options['url'].partition('?')[2],
+            REQUEST_METHOD='GET')
+        original = {connection.alias: connection.settings_dict['CONN_MAX_AGE']
+                    for connection in connections.all()}
+        results = []
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                handler(dict(environ), lambda *args: None).close()
+                for max_age in (0, options['max_age']):
+                    result = self.run(handler, environ, max_age,
+                                      options['iterations'])
+                    results.append(result)
+                    self.stdout.write(
+                        f'CONN_MAX_AGE={max_age:<5} '
+                        f'p50 {result["p50_ms"]:>7.2f} мс  '
+                        f'p95 {result["p95_ms"]:>7.2f} мс  '
+                        f'соединений открыто '
+                        f'{result["connections_opened"]}')
+        finally:
+            for connection in connections.all():
+                connection.close()
+                connection.settings_dict['CONN_MAX_AGE'] = original[
+                    connection.alias]
+
+        saved = results[0]['p50_ms'] - results[1]['p50_ms']
+        self.stdout.write(self.style.SUCCESS(
+            f'Постоянные соединения экономят {saved:.2f} мс на запрос (p50).'))
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf8') as output:
+                json.dump({'url': options['url'], 'results': results},
+                          output, ensure_ascii=False, indent=2)
@@ -0,0 +1,69 @@
+from django.core.management import BaseCommand, CommandError
+from django.test import override_settings
+from recipes.models import Recipe
+from rest_framework.test import APIClient
+from users.models import User
+
+from api.testing import QueryBudgetExceeded, query_budget
+
+# Адрес, бюджет запросов, нужна ли аутентификация. Бюджеты не должны
+# зависеть от объема данных, повторы одинаковых запросов запрещены.
+# В адресах подставляются id рецепта и его ингредиенты.
+BUDGETS = (
+    ('/api/tags/', 1, False),
+    ('/api/ingredients/?name=а', 1, False),
+    ('/api/recipes/', 4, False),
+    ('/api/recipes/', 7, True),
+    ('/api/recipes/?pagination=cursor', 6, True),
+    ('/api/recipes/?is_favorited=1&is_in_shopping_cart=1', 7, True),
+    ('/api/recipes/?search=salt', 7, True),
+    ('/api/recipes/match/?{ingredients}', 2, False),
+    ('/api/recipes/{recipe}/', 6, True),
+    ('/api/users/', 3, True),
+    ('/api/users/me/', 1, True),
+    ('/api/users/subscriptions/?recipes_limit=3', 3, True),
+    ('/api/recipes/download_shopping_cart/', 1, True),
+)
+
+
+def format_url(url, recipe):
+    return url.format(recipe=recipe.id, ingredients='&'.join(
+        f'ingredients={ingredient_id}' for ingredient_id in
+        recipe.ingredients.values_list('id', flat=True)))
+
+
+class Command(BaseCommand):
+    """Проверка бюджетов запросов к базе для основных эндпоинтов."""
+    help = ('Запрашивает основные эндпоинты API и проверяет, что число '
+            'запросов к базе не превышает бюджет и запросы не повторяются.')
+
+    def handle(self, *args, **options):
+        user = User.objects.order_by('-followers_count').first()
+        recipe = Recipe.objects.order_by('-pub_date').first()
+        if user is None or recipe is None:
+            raise CommandError('В базе нет пользователей или рецептов.')
+        failures = 0
+
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for url, budget, authenticated in BUDGETS:
+                url = format_url(url, recipe)
+                client = APIClient()
+                if authenticated:
+                    client.force_authenticate(user)
+                label = f'{url}{" (auth)" if authenticated else ""}'
+                try:
+                    with query_budget(budget) as recorder:
+                        response = client.get(url)
+                        if response.streaming:
+                            b''.join(response.streaming_content)
+                except QueryBudgetExceeded as error:
+                    failures += 1
+                    self.stderr.write(f'{label}: {error}')
+                    continue
+                self.stdout.write(
+                    f'{label}: {recorder.count}/{budget} запросов, '
+                    f'{recorder.duration * 1000:.1f} мс')
+
+        if failures:
+            raise CommandError(f'Бюджет превышен на {failures} эндпоинтах.')
+        self.stdout.write(self.style.SUCCESS('Бюджеты запросов соблюдены.'))
@@ -0,0 +1,74 @@
+import re
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.http import QueryDict
+from django.test import RequestFactory
+from recipes.models import Recipe, Tag
+from users.models import User
+
+from api.filters import RecipeFilter
+
+SEQ_SCAN = re.compile(r'Seq Scan on (recipes_\w+|users_\w+)')
+
+
+class Command(BaseCommand):
+    """Проверка планов запросов основных фильтров списка рецептов."""
+    help = ('Выводит EXPLAIN для основных комбинаций фильтров '
+            '/api/recipes/. Запускать на базе с большим объемом данных.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='Выполнить запросы (EXPLAIN ANALYZE, только PostgreSQL).')
+        parser.add_argument(
+            '--fail-on-seqscan', action='store_true',
+            help='Завершиться ошибкой, если в плане есть Seq Scan по '
+                 'таблицам проекта (только PostgreSQL).')
+
+    def filter_combinations(self):
+        user = User.objects.annotate(
+            favorites_count=Count('favorites')).order_by(
+            '-favorites_count').first()
+        author = User.objects.order_by('-recipes_count').first()
+        tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        if user is None or not tags:
+            raise CommandError('В базе нет пользователей или тегов.')
+        return user, (
+            'page=1',
+            f'author={author.id}',
+            f'tags={tags[0]}',
+            '&'.join(f'tags={tag}' for tag in tags),
+            'is_favorited=1',
+            'is_in_shopping_cart=1',
+            f'is_favorited=1&tags={tags[0]}',
+            f'author={author.id}&tags={tags[0]}&page=2',
+        )
+
+    def handle(self, *args, **options):
+        postgresql = connection.vendor == 'postgresql'
+        explain_options = {'analyze': True} if (
+            options['analyze'] and postgresql) else {}
+        page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+        user, combinations = self.filter_combinations()
+        failures = []
+
+        for params in combinations:
+            request = RequestFactory().get(f'/api/recipes/?{params}')
+            request.user = user
+            data = QueryDict(params)
+            queryset = RecipeFilter(data, queryset=Recipe.objects.all(),
+                                    request=request).qs
+            page = int(data.get('page', 1))
+            queryset = queryset[(page - 1) * page_size:page * page_size]
+            plan = queryset.explain(**explain_options)
+            self.stdout.write(self.style.MIGRATE_HEADING(f'?{params}'))
+            self.stdout.write(plan)
+            if postgresql and SEQ_SCAN.search(plan):
+                failures.append(params)
+
+        if failures and options['fail_on_seqscan']:
+            raise CommandError(
+                'Seq Scan в планах для фильтров: ' + ', '.join(failures))
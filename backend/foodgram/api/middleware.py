@@ -0,0 +1,116 @@
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('api.queries')
+
+PLACEHOLDERS = re.compile(r'\((?:%s|\?)(?:, (?:%s|\?))*\)')
+SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Нормализует SQL: списки параметров IN (...) сворачиваются."""
+    return SPACES.sub(' ', PLACEHOLDERS.sub('(...)', sql)).strip()
+
+
+class QueryRecorder:
+    """
+    Контекстный менеджер, записывающий выполненные запросы всех
+    подключений: отпечаток SQL и время выполнения.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                (fingerprint(sql), time.perf_counter() - started))
+
+    def __enter__(self):
+        self.stack = ExitStack()
+        for connection in connections.all():
+            self.stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stack.close()
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(duration for _, duration in self.queries)
+
+    @property
+    def duplicates(self):
+        """Отпечатки запросов, выполненных больше одного раза."""
+        counts = Counter(sql for sql, _ in self.queries)
+        return {sql: count for sql, count in counts.items() if count > 1}
+
+
+class QueryCountMiddleware:
+    """
+    Считает запросы к базе для каждого запроса к API: количество, общее
+    время и повторяющиеся запросы. Результат отдается в заголовках
+    X-DB-Query-Count, X-DB-Query-Time (мс) и X-DB-Duplicate-Queries и
+    пишется в лог api.queries одной JSON-строкой. Если один запрос
+    повторился не меньше QUERY_N_PLUS_ONE_THRESHOLD раз, запись пишется
+    с уровнем WARNING. Включается настройкой QUERY_INSTRUMENTATION.
+    Запросы, выполненные при отдаче потокового ответа, не учитываются.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+
+        duplicates = recorder.duplicates
+        response['X-DB-Query-Count'] = recorder.count
+        response['X-DB-Query-Time'] = f'{recorder.duration * 1000:.1f}'
+        response['X-DB-Duplicate-Queries'] = sum(
+            count - 1 for count in duplicates.values())
+
+        n_plus_one = {sql: count for sql, count in duplicates.items()
+                      if count >= settings.QUERY_N_PLUS_ONE_THRESHOLD}
+        logger.log(
+            logging.WARNING if n_plus_one else logging.INFO,
+            json.dumps({
+                'view': getattr(request, 'query_view_name', None),
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'queries': recorder.count,
+                'db_time_ms': round(recorder.duration * 1000, 1),
+                'duplicates': duplicates,
+                'n_plus_one': bool(n_plus_one),
+            }, ensure_ascii=False))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Запоминает имя вьюсета и действия: RecipeViewSet.list."""
+        view_class = getattr(view_func, 'cls', None)
+        actions = getattr(view_func, 'actions', None) or {}
+        if view_class is None:
+            request.query_view_name = view_func.__qualname__
+        else:
+            action = actions.get(request.method.lower(),
+                                 request.method.lower())
+            request.query_view_name = f'{view_class.__name__}.{action}'
+        return None
@@ -0,0 +1,167 @@
+import json
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimate_count(queryset):
+    """
+    Оценка количества строк по плану запроса PostgreSQL, на других СУБД
+    выполняется обычный COUNT.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']['Plan Rows']
+
+
+class KeysetPageNumberPagination(PageNumberPagination):
+    """
+    Постраничная пагинация с дополнительным режимом по ключу.
+
+    По умолчанию работает как PageNumberPagination. С параметром
+    pagination=cursor страницы выбираются по значениям полей
+    view.keyset_ordering последнего объекта (без OFFSET), это могут быть
+    поля модели или аннотации queryset. Ссылки next и
+    previous содержат непрозрачный cursor. Размер страницы задается
+    параметром limit, подсчет общего количества параметром count:
+    none (по умолчанию), estimate или exact.
+    """
+    mode_query_param = 'pagination'
+    keyset_mode = 'cursor'
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    count_query_param = 'count'
+    max_limit = 100
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = getattr(view, 'keyset_ordering', None)
+        self.keyset = bool(ordering) and request.query_params.get(
+            self.mode_query_param) == self.keyset_mode
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.ordering = ordering
+        self.limit = self.get_limit(request)
+        self.count = self.get_count(queryset, request)
+        values, reverse = self.decode_cursor(request, queryset.model)
+
+        if reverse:
+            ordering = [field[1:] if field.startswith('-') else f'-{field}'
+                        for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(
+                self.keyset_filter(self.ordering, values, reverse))
+        page = list(queryset[:self.limit + 1])
+        has_more = len(page) > self.limit
+        page = page[:self.limit]
+        if reverse:
+            page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+        self.page = page
+        return page
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next or not self.page:
+            return None
+        return self.build_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page:
+            return None
+        return self.build_link(self.page[0], reverse=True)
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(limit, 1), self.max_limit)
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'estimate':
+            return estimate_count(queryset)
+        return None
+
+    @staticmethod
+    def keyset_filter(ordering, values, reverse):
+        """Условие «строго после values» для составного ключа."""
+        condition, equal = Q(), {}
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            condition |= Q(**equal,
+                           **{f'{name}__{"lt" if descending else "gt"}':
+                              value})
+            equal[name] = value
+        return condition
+
+    def build_link(self, instance, reverse):
+        values = [getattr(instance, field.lstrip('-'))
+                  for field in self.ordering]
+        cursor = b64encode(json.dumps(
+            {'v': values, 'r': reverse}, default=str).encode())
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param,
+                                   cursor.decode())
+
+    @staticmethod
+    def cursor_value(model, field, value):
+        """Приводит значение из курсора к типу поля, аннотации как есть."""
+        try:
+            field = model._meta.get_field(field.lstrip('-'))
+        except FieldDoesNotExist:
+            return value
+        return field.to_python(value)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(b64decode(encoded.encode()).decode())
+            values = [self.cursor_value(model, field, value)
+                      for field, value in zip(self.ordering, cursor['v'])]
+            if len(values) != len(self.ordering):
+                raise ValueError
+            return values, bool(cursor['r'])
+        except (BinasciiError, KeyError, TypeError, ValueError,
+                UnicodeDecodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
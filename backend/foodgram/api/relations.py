@@ -0,0 +1,118 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+from recipes.models import FavoritesList, ShoppingList
+from users.models import Follow
+
+from .cache import bump_version, get_version, relations_key
+
+
+class UserRelations:
+    """
+    Множества id авторов, на которых подписан пользователь, и рецептов в
+    его избранном и корзине. Каждое множество загружается лениво и не
+    больше одного раза за запрос. При RELATION_CACHE_TIMEOUT множества
+    также хранятся в общем кеше до изменения связей.
+    """
+    sources = {
+        Follow: 'author_id',
+        FavoritesList: 'recipe_id',
+        ShoppingList: 'recipe_id',
+    }
+
+    def __init__(self, user):
+        self.user = user
+        self.loaded = {}
+
+    @classmethod
+    def for_request(cls, request):
+        relations = getattr(request, '_user_relations', None)
+        if relations is None or relations.user != request.user:
+            relations = request._user_relations = cls(request.user)
+        return relations
+
+    def get(self, model):
+        if model not in self.loaded:
+            self.loaded[model] = self.load(model)
+        return self.loaded[model]
+
+    def load(self, model):
+        if self.user.is_anonymous:
+            return frozenset()
+        ids = model.objects.filter(user=self.user).values_list(
+            self.sources[model], flat=True)
+        if not settings.RELATION_CACHE_TIMEOUT:
+            return frozenset(ids)
+        version_name = relations_key(self.user.id, model._meta.model_name)
+        key = f'{version_name}:{get_version(version_name)}'
+        cached = cache.get(key)
+        if cached is None:
+            cached = frozenset(ids)
+            cache.set(key, cached, settings.RELATION_CACHE_TIMEOUT)
+        return cached
+
+
+def relations_changed(model, user_id):
+    """Сбрасывает закешированные связи пользователя после фиксации."""
+    version_name = relations_key(user_id, model._meta.model_name)
+    transaction.on_commit(lambda: bump_version(version_name))
+
+
+def add_relations(model, field, user_id, target_ids):
+    """
+    Добавляет строки связи пользователя с объектами одним запросом
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING. Строка
+    вставляется, только если объект существует и связи еще нет.
+    Возвращает множество id объектов, для которых строка добавлена.
+    """
+    target_ids = list(target_ids)
+    if not target_ids:
+        return set()
+    qn = connection.ops.quote_name
+    target = model._meta.get_field(field).related_model._meta
+    columns = [qn('user_id'), qn(f'{field}_id')]
+    values, params = ['%s', qn(target.pk.column)], [user_id]
+    for model_field in model._meta.concrete_fields:
+        if getattr(model_field, 'auto_now_add', False):
+            columns.append(qn(model_field.column))
+            values.append('%s')
+            params.append(model_field.get_db_prep_value(
+                timezone.now(), connection))
+    placeholders = ', '.join(['%s'] * len(target_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {qn(model._meta.db_table)} ({", ".join(columns)}) '
+            f'SELECT {", ".join(values)} FROM {qn(target.db_table)} '
+            f'WHERE {qn(target.pk.column)} IN ({placeholders}) '
+            f'ON CONFLICT DO NOTHING RETURNING {qn(f"{field}_id")}',
+            params + target_ids)
+        added = {row[0] for row in cursor.fetchall()}
+    if added:
+        relations_changed(model, user_id)
+    return added
+
+
+def remove_relations(model, field, user_id, target_ids=None):
+    """
+    Удаляет строки связи одним запросом DELETE ... RETURNING, без
+    target_ids удаляются все связи пользователя. Возвращает множество
+    id объектов, для которых строка была удалена.
+    """
+    qn = connection.ops.quote_name
+    condition, params = f'{qn("user_id")} = %s', [user_id]
+    if target_ids is not None:
+        target_ids = list(target_ids)
+        if not target_ids:
+            return set()
+        placeholders = ', '.join(['%s'] * len(target_ids))
+        condition += f' AND {qn(f"{field}_id")} IN ({placeholders})'
+        params += target_ids
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {qn(model._meta.db_table)} WHERE {condition} '
+            f'RETURNING {qn(f"{field}_id")}', params)
+        removed = {row[0] for row in cursor.fetchall()}
+    if removed:
+        relations_changed(model, user_id)
+    return removed
@@ -0,0 +1,224 @@
+import heapq
+import logging
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import chain, groupby
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.models import (Case, Exists, F, FloatField, IntegerField,
+                              OuterRef, Q, Value, When)
+from recipes.models import Ingredient, IngredientRecipe, Recipe
+
+from .cache import get_version
+
+logger = logging.getLogger(__name__)
+
+
+class IngredientSearchIndex:
+    """
+    Индекс ингредиентов в памяти процесса, отсортированный по названию.
+    Перестраивается, когда меняется версия ингредиентов в кеше.
+    Для поиска подстроки названия склеены в одну строку: str.find по ней
+    работает намного быстрее перебора списка.
+    Ключи, смещения, строка и элементы публикуются одним кортежем state,
+    поэтому поиск во время перестроения видит согласованный индекс.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.state = ([], [], '', [])
+        self.lock = threading.Lock()
+
+    def build(self):
+        version = get_version('ingredients')
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            rows = sorted(
+                Ingredient.objects.values_list(
+                    'id', 'name', 'measurement_unit').iterator(),
+                key=lambda row: (row[1].lower(), row[0]))
+            items = [
+                {'id': id, 'name': name, 'measurement_unit': unit}
+                for id, name, unit in rows]
+            keys = [name.lower().replace('\n', ' ') for _, name, _ in rows]
+            offsets, offset = [], 0
+            for key in keys:
+                offsets.append(offset)
+                offset += len(key) + 1
+            self.state = (keys, offsets, '\n'.join(keys), items)
+            self.version = version
+
+    def warm_up(self):
+        """Строит индекс при старте приложения, если база доступна."""
+        try:
+            self.build()
+        except DatabaseError as err:
+            logger.warning(f'Индекс ингредиентов не построен: {err}')
+
+    def search(self, query, limit):
+        self.build()
+        keys, offsets, text, items = self.state
+        query = query.lower().replace('\n', ' ')
+        positions = []
+        start = bisect_left(keys, query)
+        for position in range(start, len(keys)):
+            if len(positions) >= limit or not keys[position].startswith(
+                    query):
+                break
+            positions.append(position)
+        prefix_end = start + len(positions)
+        found = text.find(query)
+        while found != -1 and len(positions) < limit:
+            position = bisect_right(offsets, found) - 1
+            if not start <= position < prefix_end:
+                positions.append(position)
+            if position + 1 == len(offsets):
+                break
+            found = text.find(query, offsets[position + 1])
+        return [items[position] for position in positions]
+
+
+ingredient_index = IngredientSearchIndex()
+
+
+def search_ingredients(query, limit=None):
+    """
+    Ищет ингредиенты по названию: сначала совпадения с начала названия,
+    затем по вхождению подстроки. Размер выдачи ограничен.
+    """
+    limit = limit or settings.INGREDIENT_SEARCH_LIMIT
+    if settings.INGREDIENT_SEARCH_INDEX:
+        return ingredient_index.search(query, limit)
+    return list(Ingredient.objects.filter(name__icontains=query).annotate(
+        rank=Case(When(name__istartswith=query, then=Value(0)),
+                  default=Value(1), output_field=IntegerField()),
+    ).order_by('rank', 'name').values(
+        'id', 'name', 'measurement_unit')[:limit])
+
+
+class RecipeIngredientIndex:
+    """
+    Инвертированный индекс состава рецептов в памяти процесса: для каждого
+    ингредиента хранится отсортированный массив id рецептов (array 'I'),
+    для каждого рецепта - число его ингредиентов. Перестраивается, когда
+    меняется версия recipe_ingredients в кеше.
+    Подбор по набору ингредиентов сводится к подсчету вхождений id рецептов
+    в массивах этих ингредиентов, без соединения таблиц в базе.
+    Массивы и размеры рецептов публикуются одним кортежем state.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.state = ({}, {})
+        self.lock = threading.Lock()
+
+    def build(self):
+        version = get_version('recipe_ingredients')
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            rows = IngredientRecipe.objects.order_by(
+                'ingredient_id', 'recipe_id').values_list(
+                'ingredient_id', 'recipe_id').iterator()
+            postings = {
+                ingredient_id: array('I', (row[1] for row in group))
+                for ingredient_id, group in groupby(rows, lambda row: row[0])}
+            self.state = (postings,
+                          Counter(chain.from_iterable(postings.values())))
+            self.version = version
+
+    def warm_up(self):
+        """Строит индекс при старте приложения, если база доступна."""
+        try:
+            self.build()
+        except DatabaseError as err:
+            logger.warning(f'Индекс состава рецептов не построен: {err}')
+
+    def match(self, ingredient_ids, limit, min_coverage=0):
+        """
+        Возвращает до limit кортежей (id рецепта, найдено ингредиентов,
+        всего ингредиентов) по убыванию доли имеющихся ингредиентов, затем
+        числа найденных ингредиентов и id рецепта.
+        """
+        self.build()
+        postings, sizes = self.state
+        found = Counter(chain.from_iterable(
+            postings.get(ingredient_id, ())
+            for ingredient_id in set(ingredient_ids)))
+        matches = ((recipe_id, count, sizes[recipe_id])
+                   for recipe_id, count in found.items()
+                   if count >= min_coverage * sizes[recipe_id])
+        return heapq.nlargest(
+            limit, matches,
+            key=lambda match: (match[1] / match[2], match[1], match[0]))
+
+
+recipe_index = RecipeIngredientIndex()
+
+
+def match_recipes(ingredients, limit=None, min_coverage=0):
+    """
+    Подбирает рецепты по id имеющихся ингредиентов. Возвращает рецепты с
+    атрибутами ingredients_found, ingredients_total и coverage в порядке
+    убывания доли имеющихся ингредиентов.
+    """
+    limit = limit or settings.RECIPE_MATCH_LIMIT
+    matches = recipe_index.match(ingredients, limit, min_coverage)
+    recipes = Recipe.objects.in_bulk([recipe_id for recipe_id, _, _ in
+                                      matches])
+    result = []
+    for recipe_id, found, total in matches:
+        recipe = recipes.get(recipe_id)
+        if recipe is None:
+            continue
+        recipe.ingredients_found = found
+        recipe.ingredients_total = total
+        recipe.coverage = round(found / total, 4)
+        result.append(recipe)
+    return result
+
+
+# Веса частей рецепта как в ts_rank по умолчанию: A, B, C.
+SEARCH_WEIGHTS = (('name', 1.0), ('ingredient', 0.4), ('text', 0.2))
+
+
+def search_recipes(queryset, query):
+    """
+    Полнотекстовый поиск рецептов по названию, описанию и ингредиентам.
+    Добавляет к queryset аннотацию search_rank для сортировки.
+
+    В PostgreSQL используются столбец search_vector с GIN-индексом и
+    websearch_to_tsquery со стеммингом RECIPE_SEARCH_CONFIG. На других
+    СУБД каждое слово запроса ищется подстрокой без стемминга.
+    """
+    if connections[queryset.db].vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        query = SearchQuery(query, config=settings.RECIPE_SEARCH_CONFIG,
+                            search_type='websearch')
+        return queryset.filter(search_vector__matches=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query))
+
+    rank = Value(0.0, output_field=FloatField())
+    for word in query.split()[:settings.RECIPE_SEARCH_MAX_WORDS]:
+        conditions = {
+            'name': Q(name__icontains=word),
+            'ingredient': Q(Exists(IngredientRecipe.objects.filter(
+                recipe=OuterRef('pk'), ingredient__name__icontains=word))),
+            'text': Q(text__icontains=word),
+        }
+        matched = Q()
+        for part, weight in SEARCH_WEIGHTS:
+            matched |= conditions[part]
+            rank = rank + Case(When(conditions[part], then=Value(weight)),
+                               default=Value(0.0), output_field=FloatField())
+        queryset = queryset.filter(matched)
+    return queryset.annotate(search_rank=rank)
@@ -1,14 +1,20 @@
-import base64
 from abc import ABC
 
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
+from recipes.images import decode_image, schedule_variants
 from recipes.models import (FavoritesList, Ingredient, IngredientRecipe,
-                            Recipe, ShoppingList, Tag)
+                            Recipe, ShoppingCartIngredient, ShoppingList, Tag)
 from rest_framework import serializers
 from users.models import Follow, User
 
+from .cache import bump_version
+from .relations import UserRelations
+
 
 class CustomUserCreateSerializer(UserCreateSerializer):
     """Описание сериализатора для модели User, запись."""
@@ -30,11 +36,17 @@ class CustomUserSerializer(UserSerializer):
             'is_subscribed',)
 
     def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return Follow.objects.filter(user=self.context['request'].user,
-                                     author=obj).exists()
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return obj.id in UserRelations.for_request(
+            self.context['request']).get(Follow)
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Описание сериализатора списка id рецептов для пакетных операций."""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1, ),
+        allow_empty=False, max_length=100, )
 
 
 class PasswordSerializer(serializers.Serializer):
@@ -65,19 +77,82 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit',)
 
 
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Ссылки на уменьшенные и WebP-версии картинки рецепта."""
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        urls = {}
+        for variant, name in value.items():
+            url = Recipe._meta.get_field('image').storage.url(name)
+            urls[variant] = (request.build_absolute_uri(url)
+                             if request else url)
+        return urls
+
+
+class IngredientAmountSerializer(serializers.ModelSerializer):
+    """Описание сериализатора для ингредиента в рецепте с количеством."""
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit')
+
+    class Meta:
+        model = IngredientRecipe
+        fields = ('id', 'name', 'measurement_unit', 'amount',)
+
+
 class RecipeBaseSerializer(serializers.ModelSerializer):
     """Описание упрощенного сериализатора для модели Recipe."""
 
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
+
+
+class RecipeMatchQuerySerializer(serializers.Serializer):
+    """Описание параметров подбора рецептов по имеющимся ингредиентам."""
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1, ),
+        allow_empty=False, max_length=100, )
+    min_coverage = serializers.FloatField(min_value=0, max_value=1,
+                                          default=0, )
+    limit = serializers.IntegerField(min_value=1, max_value=100,
+                                     default=settings.RECIPE_MATCH_LIMIT, )
+
+
+class RecipeMatchSerializer(RecipeBaseSerializer):
+    """Описание сериализатора рецепта, подобранного по ингредиентам."""
+    ingredients_found = serializers.IntegerField(read_only=True, )
+    ingredients_total = serializers.IntegerField(read_only=True, )
+    coverage = serializers.FloatField(read_only=True, )
+
+    class Meta(RecipeBaseSerializer.Meta):
+        fields = RecipeBaseSerializer.Meta.fields + (
+            'ingredients_found', 'ingredients_total', 'coverage',)
+
+
+class SubscriptionSerializer(CustomUserSerializer):
+    """Описание сериализатора для автора в подписках, с его рецептами."""
+    recipes = RecipeBaseSerializer(source='limited_recipes', many=True,
+                                   read_only=True, )
+    recipes_count = serializers.IntegerField(read_only=True, )
+    followers_count = serializers.IntegerField(read_only=True, )
+
+    class Meta(CustomUserSerializer.Meta):
+        fields = CustomUserSerializer.Meta.fields + (
+            'recipes', 'recipes_count', 'followers_count',)
 
 
 class RecipeSerializer(serializers.ModelSerializer):
     """Описание сериализатора для модели Recipe."""
-    author = UserSerializer(read_only=True, )
-    ingredients = IngredientSerializer(many=True, )
+    author = CustomUserSerializer(read_only=True, )
+    ingredients = IngredientAmountSerializer(source='ingredient', many=True,
+                                             read_only=True, )
     image = Base64ImageField()
+    image_variants = ImageVariantsField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -85,28 +160,17 @@ class RecipeSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time',)
-
-    def to_representation(self, instance):
-        output = super().to_representation(instance)
-        ingredients = output['ingredients']
-        for ingredient in ingredients:
-            amount = IngredientRecipe.objects.get(
-                ingredient=ingredient.get('id'), recipe=instance).amount
-            ingredient['amount'] = amount
-        return output
+            'is_in_shopping_cart', 'name', 'image', 'image_variants', 'text',
+            'cooking_time', 'favorites_count', 'shopping_count',)
+        read_only_fields = ('favorites_count', 'shopping_count',)
 
     def get_is_favorited(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return FavoritesList.objects.filter(user=user, recipe=obj).exists()
+        return obj.id in UserRelations.for_request(
+            self.context['request']).get(FavoritesList)
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return ShoppingList.objects.filter(user=user, recipe=obj).exists()
+        return obj.id in UserRelations.for_request(
+            self.context['request']).get(ShoppingList)
 
 
 class RecipeGETSerializer(RecipeSerializer):
@@ -145,57 +209,124 @@ class RecipePOSTSerializer(RecipeSerializer):
         return value
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance], 'tags',
+            Prefetch('ingredient',
+                     queryset=IngredientRecipe.objects.select_related(
+                         'ingredient')))
         output = super().to_representation(instance)
-        tags = output['tags']
-        new_tags = []
-        for tag_id in tags:
-            new_tags.append(Tag.objects.values().get(id=tag_id))
-        output['tags'] = new_tags
+        output['tags'] = TagSerializer(instance.tags.all(), many=True).data
         return output
 
     def to_internal_value(self, data):
-        ingredients = data.get('ingredients')
-        for ingredient in ingredients:
-            ingredient['name'] = (
-                Ingredient.objects.values().get(id=ingredient['id'])['name'])
+        ingredients = data.get('ingredients') or []
+        try:
+            ingredient_ids = [int(ingredient['id'])
+                              for ingredient in ingredients]
+        except (KeyError, TypeError, ValueError):
+            raise serializers.ValidationError(
+                {'ingredients': 'Ингредиенты заданы неверно!'})
+        if len(set(ingredient_ids)) != len(ingredient_ids):
+            raise serializers.ValidationError({
+                'ingredients': 'Ингредиенты в рецепте не должны повторяться!'})
+        names = dict(Ingredient.objects.filter(
+            id__in=ingredient_ids).values_list('id', 'name'))
+        for ingredient, ingredient_id in zip(ingredients, ingredient_ids):
+            if ingredient_id not in names:
+                raise serializers.ValidationError({
+                    'ingredients': f'Ингредиент с id {ingredient_id} '
+                                   f'не найден!'})
+            ingredient['id'] = ingredient_id
+            ingredient['name'] = names[ingredient_id]
+        data['ingredients'] = ingredients
+
+        tag_ids = set(data.get('tags') or [])
+        if len(tag_ids) != Tag.objects.filter(id__in=tag_ids).count():
+            raise serializers.ValidationError(
+                {'tags': 'Теги заданы неверно!'})
 
         image = data.get('image')
         if isinstance(image, str) and image.startswith('data:image'):
-            img_format, img_str = image.split(';base64,')
-            ext = img_format.split('/')[-1]
-            data['image'] = ContentFile(base64.b64decode(img_str),
-                                        name='temp.' + ext)
+            try:
+                data['image'] = decode_image(image)
+            except DjangoValidationError as err:
+                raise serializers.ValidationError({'image': err.messages})
+        elif isinstance(image, str) and self.instance is not None:
+            data.pop('image')
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
 
         recipe = Recipe.objects.create(**validated_data)
-        recipe.tags.set(tags)
-
-        for ingredient in ingredients:
-            current_ingredient = Ingredient.objects.get(
-                id=ingredient.get('id'))
-            IngredientRecipe.objects.create(ingredient=current_ingredient,
-                                            recipe=recipe,
-                                            amount=ingredient.get(
-                                                'amount'))
+        Recipe.tags.through.objects.bulk_create(
+            [Recipe.tags.through(recipe=recipe, tag_id=tag_id)
+             for tag_id in set(tags)])
+        IngredientRecipe.objects.bulk_create(
+            [IngredientRecipe(recipe=recipe, ingredient_id=ingredient['id'],
+                              amount=ingredient['amount'])
+             for ingredient in ingredients])
+        bump_version('recipe_ingredients')
+        schedule_variants(recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        tags = validated_data.pop('tags')
-        ingredients = validated_data.pop('ingredients')
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredients', None)
+        image_changed = 'image' in validated_data
+        if image_changed:
+            instance.image_variants = {}
         for key, value in validated_data.items():
             if hasattr(instance, key):
                 setattr(instance, key, value)
         if tags:
             instance.tags.set(tags)
         if ingredients:
-            instance.ingredients.clear()
-            for ingredient in ingredients:
-                IngredientRecipe.objects.get_or_create(
-                    ingredient_id=ingredient.get('id'), recipe=instance,
-                    amount=ingredient.get('amount'))
+            self.update_ingredients(instance, ingredients)
         instance.save()
+        if image_changed:
+            schedule_variants(instance)
         return instance
+
+    def update_ingredients(self, instance, ingredients):
+        """
+        Сравнивает новый состав рецепта с текущим и удаляет, добавляет и
+        изменяет только отличающиеся строки.
+        """
+        current = {row.ingredient_id: row
+                   for row in IngredientRecipe.objects.filter(recipe=instance)}
+        new_amounts = {ingredient['id']: int(ingredient['amount'])
+                       for ingredient in ingredients}
+        old_amounts = {ingredient_id: row.amount
+                       for ingredient_id, row in current.items()}
+        if new_amounts == old_amounts:
+            return
+
+        removed = current.keys() - new_amounts.keys()
+        if removed:
+            IngredientRecipe.objects.filter(
+                id__in=[current[ingredient_id].id
+                        for ingredient_id in removed]).delete()
+        IngredientRecipe.objects.bulk_create(
+            [IngredientRecipe(recipe=instance, ingredient_id=ingredient_id,
+                              amount=amount)
+             for ingredient_id, amount in new_amounts.items()
+             if ingredient_id not in current])
+        changed = []
+        for ingredient_id, row in current.items():
+            amount = new_amounts.get(ingredient_id)
+            if amount is not None and amount != row.amount:
+                row.amount = amount
+                changed.append(row)
+        IngredientRecipe.objects.bulk_update(changed, ['amount'])
+
+        # Удаленные строки корзины уже вычли сигналы post_delete, а
+        # bulk_create и bulk_update сигналов не отправляют.
+        ShoppingCartIngredient.update_recipe(
+            instance, {ingredient_id: amount
+                       for ingredient_id, amount in old_amounts.items()
+                       if ingredient_id not in removed}, new_amounts)
+        bump_version('recipe_ingredients')
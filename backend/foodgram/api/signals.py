@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from recipes.models import (FavoritesList, Ingredient, IngredientRecipe,
+                            ShoppingList, Tag)
+from rest_framework.authtoken.models import Token
+from users.models import Follow, User
+
+from .authentication import invalidate_user_tokens
+from .cache import auth_token_key, bump_version
+from .relations import relations_changed
+
+
+@receiver((post_save, post_delete), sender=Follow)
+@receiver((post_save, post_delete), sender=FavoritesList)
+@receiver((post_save, post_delete), sender=ShoppingList)
+def relation_changed(sender, instance, **kwargs):
+    """Сбрасывает закешированные связи пользователя."""
+    relations_changed(sender, instance.user_id)
+
+
+@receiver((post_save, post_delete), sender=IngredientRecipe)
+def recipe_ingredients_changed(sender, instance, **kwargs):
+    """Сбрасывает индекс подбора рецептов при изменении их состава."""
+    bump_version('recipe_ingredients')
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredients_changed(sender, instance, **kwargs):
+    """Сбрасывает кеш и индекс поиска ингредиентов."""
+    bump_version('ingredients')
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tags_changed(sender, instance, **kwargs):
+    """Сбрасывает кеш тегов."""
+    bump_version('tags')
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    """Сбрасывает кеш токена при выходе пользователя."""
+    bump_version(auth_token_key(instance.key))
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, **kwargs):
+    """
+    Сбрасывает кеш токенов пользователя при его изменении, в том числе
+    при смене пароля и деактивации.
+    """
+    invalidate_user_tokens(instance.id)
+
+
+@receiver(request_started)
+def check_connections(sender, **kwargs):
+    """
+    При DB_CONN_HEALTH_CHECKS закрывает постоянные соединения с базой,
+    которые перестали отвечать, до начала обработки запроса.
+    """
+    if not settings.DB_CONN_HEALTH_CHECKS:
+        return
+    for connection in connections.all():
+        if connection.connection is not None and not connection.is_usable():
+            connection.close()
@@ -0,0 +1,39 @@
+from contextlib import contextmanager
+
+from .middleware import QueryRecorder
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    values = sorted(values)
+    return values[max(0, -(-len(values) * percent // 100) - 1)]
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Код выполнил больше запросов, чем позволяет бюджет."""
+
+
+@contextmanager
+def query_budget(max_queries, max_duplicates=0):
+    """
+    Проверяет, что код внутри блока выполнил не больше max_queries
+    запросов и не больше max_duplicates повторов одного и того же
+    запроса. В тестах:
+
+        with query_budget(8):
+            client.get('/api/recipes/')
+    """
+    with QueryRecorder() as recorder:
+        yield recorder
+    check_budget(recorder, max_queries, max_duplicates)
+
+
+def check_budget(recorder, max_queries, max_duplicates=0):
+    """Сравнивает записанные запросы с бюджетом."""
+    repeated = sum(count - 1 for count in recorder.duplicates.values())
+    if recorder.count > max_queries or repeated > max_duplicates:
+        message = (f'Запросов {recorder.count} при бюджете {max_queries}, '
+                   f'повторов {repeated} при допустимых {max_duplicates}.')
+        for sql, count in recorder.duplicates.items():
+            message += f'\n  {count} x {sql}'
+        raise QueryBudgetExceeded(message)
@@ -1,7 +1,9 @@
+from django.conf import settings
 from django.urls import include, path
 from django.views.generic import TemplateView
 from rest_framework.routers import DefaultRouter
 
+from .async_views import async_view, download_shopping_cart
 from .views import (CustomUserViewSet, IngredientViewSet, RecipeViewSet,
                     TagViewSet)
 
@@ -20,3 +22,22 @@ urlpatterns = [
         TemplateView.as_view(template_name='redoc.html'),
         name='redoc'),
 ]
+
+# В режиме ASYNC_VIEWS (под ASGI) загрузка картинок при создании и
+# изменении рецептов, выгрузка корзины и лента подписок обслуживаются
+# асинхронными представлениями.
+if settings.ASYNC_VIEWS:
+    urlpatterns = [
+        path('api/recipes/download_shopping_cart/',
+             download_shopping_cart),
+        path('api/recipes/',
+             async_view(RecipeViewSet.as_view(
+                 {'get': 'list', 'post': 'create'}))),
+        path('api/recipes/<int:pk>/',
+             async_view(RecipeViewSet.as_view(
+                 {'get': 'retrieve', 'put': 'update',
+                  'patch': 'partial_update', 'delete': 'destroy'}))),
+        path('api/users/subscriptions/',
+             async_view(CustomUserViewSet.as_view(
+                 {'get': 'subscriptions'}))),
+    ] + urlpatterns
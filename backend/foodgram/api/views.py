@@ -1,64 +1,55 @@
-from django.db.models import Sum
-from django.http import HttpResponse
-from django_filters.rest_framework import (BooleanFilter, DjangoFilterBackend,
-                                           FilterSet,
-                                           ModelMultipleChoiceFilter)
+from django.db import transaction
+from django.db.models import (BooleanField, F, OuterRef, Prefetch, Subquery,
+                              Value)
+from django.http import Http404, StreamingHttpResponse
+from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from recipes.models import (FavoritesList, Ingredient, IngredientRecipe,
-                            Recipe, ShoppingList, Tag)
-from rest_framework import filters, permissions, status, viewsets
+                            Recipe, ShoppingCartIngredient, ShoppingList,
+                            Tag, change_counter)
+from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from users.models import Follow, User
 
+from .cache import CachedResponseMixin
+from .exports import EXPORT_FORMATS, shopping_cart_ingredients
+from .filters import RecipeFilter
+from .pagination import KeysetPageNumberPagination
 from .permissions import IsAuthorOrReadOnly
+from .relations import add_relations, remove_relations
+from .search import match_recipes, search_ingredients
 from .serializers import (CustomUserCreateSerializer, CustomUserSerializer,
                           IngredientSerializer, PasswordSerializer,
-                          RecipeBaseSerializer, RecipeGETSerializer,
+                          RecipeGETSerializer, RecipeIdsSerializer,
+                          RecipeMatchQuerySerializer, RecipeMatchSerializer,
                           RecipePOSTSerializer, RecipeSerializer,
-                          TagSerializer)
+                          SubscriptionSerializer, TagSerializer)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для работы с моделью Tag."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
+    cache_version_name = 'tags'
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для работы с моделью Ingredient."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
-    filter_backends = (filters.SearchFilter,)
-    search_fields = ('name',)
+    cache_version_name = 'ingredients'
 
-
-class RecipeFilter(FilterSet):
-    """Кастомный фильтр для фильтрации во вьюсете рецепта."""
-    tags = ModelMultipleChoiceFilter(field_name='tags__slug',
-                                     to_field_name='slug',
-                                     queryset=Tag.objects.all(), )
-
-    is_favorited = BooleanFilter(method='filter_is_favorited')
-    is_in_shopping_cart = BooleanFilter(method='filter_is_in_shopping_cart')
-
-    def filter_is_favorited(self, queryset, name, value):
-        user = self.request.user
-        if user.is_anonymous:
-            return queryset
-        return queryset.filter(favorites__user=user)
-
-    def filter_is_in_shopping_cart(self, queryset, name, value):
-        user = self.request.user
-        if user.is_anonymous:
-            return queryset
-        return queryset.filter(shopping__user=user)
-
-    class Meta:
-        model = Recipe
-        fields = ['author', 'tags', 'is_favorited', 'is_in_shopping_cart', ]
+    def list(self, request, *args, **kwargs):
+        name = (request.query_params.get('name')
+                or request.query_params.get('search'))
+        if name:
+            return self.cached_response(
+                request, lambda: Response(search_ingredients(name)))
+        return super().list(request, *args, **kwargs)
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
@@ -67,9 +58,52 @@ class RecipeViewSet(viewsets.ModelViewSet):
     serializer_class = RecipeSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    pagination_class = KeysetPageNumberPagination
+    default_ordering = ('-pub_date', '-id')
+    orderings = {
+        'favorites': ('-favorites_count', '-id'),
+        'shopping_cart': ('-shopping_count', '-id'),
+        'trending': ('-trending', '-id'),
+    }
+    search_ordering = ('-search_rank', '-id')
+
+    @property
+    def keyset_ordering(self):
+        """
+        Порядок ленты задается параметром ordering: favorites,
+        shopping_cart или trending. Без него результаты поиска идут по
+        релевантности, остальная лента - сначала новые.
+        """
+        params = self.request.query_params
+        if params.get('ordering') in self.orderings:
+            return self.orderings[params['ordering']]
+        if params.get('search'):
+            return self.search_ordering
+        return self.default_ordering
+
+    def get_queryset(self):
+        queryset = Recipe.objects.select_related('author').prefetch_related(
+            'tags',
+            Prefetch('ingredient',
+                     queryset=IngredientRecipe.objects.select_related(
+                         'ingredient')),
+        )
+        if self.action != 'list':
+            return queryset
+        if self.keyset_ordering is self.orderings['trending']:
+            queryset = queryset.filter(score__isnull=False).annotate(
+                trending=F('score__trending'))
+        return queryset
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action != 'list':
+            return queryset
+        # Сортировка после фильтров: search_rank добавляет RecipeFilter.
+        return queryset.order_by(*self.keyset_ordering)
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'match']:
             permission_classes = [permissions.AllowAny]
         else:
             permission_classes = [permissions.IsAuthenticated,
@@ -87,29 +121,41 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(methods=['get'], detail=False,
             url_path='download_shopping_cart', )
     def get_download_shopping_cart(self, request):
-        """Функция предназначена для выгрузки в файл списка покупок."""
-        recipes_list = list(ShoppingList.objects.filter(
-            user=self.request.user).values_list('recipe', flat=True))
-        ingredients = IngredientRecipe.objects.filter(
-            recipe_id__in=
-            recipes_list).values('ingredient__name',
-                                 'ingredient__measurement_unit').annotate(
-            total_amount=Sum('amount'))
-
-        response = HttpResponse(content_type='text/plain')
-        response[
-            'Content-Disposition'] = (
-            'attachment; filename="my_shopping_cart.txt"')
-
-        response.write('Мой список покупок:\n')
-        for row_num, ingredient in enumerate(ingredients, start=1):
-            response.write(
-                f'{row_num}: {ingredient.get("ingredient__name")} - '
-                f'{ingredient.get("total_amount")} '
-                f'{ingredient.get("ingredient__measurement_unit")}\n')
+        """
+        Функция предназначена для выгрузки в файл списка покупок.
+        Формат файла задается параметром file_format: txt, csv или pdf.
+        """
+        file_format = request.query_params.get('file_format', 'txt')
+        if file_format not in EXPORT_FORMATS:
+            return Response(f'Неизвестный формат файла: {file_format}!',
+                            status=status.HTTP_400_BAD_REQUEST, )
+        ingredients = shopping_cart_ingredients(self.request.user.id)
 
+        content_type, render = EXPORT_FORMATS[file_format]
+        response = StreamingHttpResponse(render(ingredients.iterator()),
+                                         content_type=content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="my_shopping_cart.{file_format}"')
         return response
 
+    @action(methods=['get'], detail=False, url_path='match', )
+    def match(self, request):
+        """
+        Подбор рецептов по имеющимся ингредиентам: параметр ingredients
+        повторяется для каждого id. Рецепты упорядочены по доле
+        ингредиентов, которые уже есть, min_coverage отсекает рецепты с
+        меньшей долей.
+        """
+        serializer = RecipeMatchQuerySerializer(data={
+            'ingredients': request.query_params.getlist('ingredients'),
+            **{key: request.query_params[key]
+               for key in ('min_coverage', 'limit')
+               if key in request.query_params}})
+        serializer.is_valid(raise_exception=True)
+        recipes = match_recipes(**serializer.validated_data)
+        return Response(RecipeMatchSerializer(
+            recipes, many=True, context={'request': request}).data)
+
     @action(methods=['post', 'delete'], detail=True,
             url_path='shopping_cart', )
     def get_shopping_cart(self, request, pk):
@@ -124,30 +170,117 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return self.__add_delete_recipe_relation(request, pk, FavoritesList,
                                                  'избранном!')
 
-    def __add_delete_recipe_relation(self, request, pk, model, table_name):
-        recipe = Recipe.objects.get(pk=pk)
+    @action(methods=['post', 'delete'], detail=False,
+            url_path='shopping_cart/bulk', )
+    def bulk_shopping_cart(self, request):
+        """Функция для пакетного добавления и удаления рецептов корзины."""
+        return self.__bulk_recipe_relation(request, ShoppingList)
+
+    @action(methods=['post', 'delete'], detail=False,
+            url_path='favorite/bulk', )
+    def bulk_favorite(self, request):
+        """Функция для пакетного добавления и удаления избранного."""
+        return self.__bulk_recipe_relation(request, FavoritesList)
+
+    @action(methods=['delete'], detail=False, url_path='shopping_cart', )
+    def clear_shopping_cart(self, request):
+        """Функция очищает корзину пользователя."""
+        self.__remove_recipes(ShoppingList)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
-        obj = model.objects.filter(recipe=recipe, user=self.request.user)
-        serializer = self.get_serializer(recipe)
+    def __add_recipes(self, model, recipe_ids):
+        """
+        Добавляет рецепты в список пользователя одним INSERT и обновляет
+        счетчики. Возвращает id добавленных рецептов.
+        """
+        user = self.request.user
+        with transaction.atomic():
+            added = add_relations(model, 'recipe', user.id, recipe_ids)
+            if added:
+                change_counter(Recipe.objects.filter(pk__in=added),
+                               model.counter_field, 1)
+                if model is ShoppingList:
+                    ShoppingCartIngredient.add_recipes(user, added)
+        return added
+
+    def __remove_recipes(self, model, recipe_ids=None):
+        """
+        Удаляет рецепты из списка пользователя одним DELETE, без
+        recipe_ids список очищается полностью. Возвращает id удаленных
+        рецептов.
+        """
+        user = self.request.user
+        with transaction.atomic():
+            removed = remove_relations(model, 'recipe', user.id, recipe_ids)
+            if removed:
+                change_counter(Recipe.objects.filter(pk__in=removed),
+                               model.counter_field, -1)
+                if model is ShoppingList:
+                    if recipe_ids is None:
+                        ShoppingCartIngredient.objects.filter(
+                            user=user).delete()
+                    else:
+                        ShoppingCartIngredient.remove_recipes(user, removed)
+        return removed
+
+    def __add_delete_recipe_relation(self, request, pk, model, table_name):
+        """
+        Добавление и удаление выполняются одним запросом без
+        предварительных проверок, поэтому одновременные запросы не
+        приводят к нарушению уникальности.
+        """
+        if not str(pk).isdigit():
+            raise Http404
 
         if request.method == "POST":
-            if obj.exists():
+            added = self.__add_recipes(model, [int(pk)])
+            recipe = get_object_or_404(self.get_queryset(), pk=pk)
+            if not added:
                 return Response(f'Этот рецепт уже в {table_name}',
                                 status=status.HTTP_400_BAD_REQUEST, )
-            new_obj = model(recipe=recipe, user=self.request.user)
-            new_obj.save()
-            return Response(serializer.data)
+            return Response(self.get_serializer(recipe).data)
         else:
-            if not obj.exists():
+            if not self.__remove_recipes(model, [int(pk)]):
+                get_object_or_404(Recipe, pk=pk)
                 return Response(f'Этого рецепта нет в {table_name}',
                                 status=status.HTTP_400_BAD_REQUEST, )
-            obj.delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def __bulk_recipe_relation(self, request, model):
+        """
+        Добавляет или удаляет список рецептов одним запросом и
+        возвращает результат для каждого id: added или exists при
+        добавлении, removed или missing при удалении, not_found для
+        несуществующих рецептов.
+        """
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = list(dict.fromkeys(
+            serializer.validated_data['recipes']))
+
+        if request.method == "POST":
+            changed = self.__add_recipes(model, recipe_ids)
+            done, skipped = 'added', 'exists'
+        else:
+            changed = self.__remove_recipes(model, recipe_ids)
+            done, skipped = 'removed', 'missing'
+        unchanged = set(recipe_ids) - changed
+        existing = set(Recipe.objects.filter(
+            pk__in=unchanged).values_list('pk', flat=True)) if (
+            unchanged) else set()
+        return Response({'results': [
+            {'id': recipe_id,
+             'status': (done if recipe_id in changed
+                        else skipped if recipe_id in existing
+                        else 'not_found')}
+            for recipe_id in recipe_ids]})
+
 
 class CustomUserViewSet(UserViewSet):
     """Вьюсет для работы с моделью User."""
     queryset = User.objects.all()
+    pagination_class = KeysetPageNumberPagination
+    keyset_ordering = ('id',)
 
     def get_serializer_class(self):
         if self.request.method in ['POST', 'DELETE']:
@@ -161,54 +294,71 @@ class CustomUserViewSet(UserViewSet):
             permission_classes = (permissions.AllowAny,)
         return [permission() for permission in permission_classes]
 
+    def get_subscribed_authors(self, authors):
+        """
+        Добавляет к авторам их последние рецепты, число рецептов берется
+        из User.recipes_count. Количество рецептов ограничивается
+        параметром recipes_limit.
+        """
+        recipes = Recipe.objects.order_by('-pub_date')
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if recipes_limit is not None and recipes_limit.isdigit():
+            recipes = recipes.filter(id__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')).order_by(
+                    '-pub_date').values('id')[:int(recipes_limit)]))
+        return authors.annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='limited_recipes'))
+
     @action(methods=['get'], detail=False, url_path='subscriptions', )
     def subscriptions(self, request):
         """Функция возвращает список подписок."""
-        authors = User.objects.filter(following__user=self.request.user)
+        authors = self.get_subscribed_authors(User.objects.filter(
+            following__user=self.request.user).order_by('id'))
         page = self.paginate_queryset(authors)
-        serializer = self.get_serializer(page, many=True)
-
-        data = serializer.data
-
-        for author in data:
-            recipes = Recipe.objects.filter(author__id=author.get('id'))
-            recipes_serializer = RecipeBaseSerializer(recipes, many=True,
-                                                      read_only=True)
-            author['recipes'] = recipes_serializer.data
-        return self.get_paginated_response(data)
+        serializer = SubscriptionSerializer(
+            page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
 
     @action(methods=['post', 'delete'], detail=False,
             url_path=r'(?P<pk>\d+)/subscribe', )
     def subscribe(self, request, pk):
-        """Функция для работы с подписками."""
-        author = User.objects.get(pk=pk)
-
-        if author == self.request.user:
+        """
+        Функция для работы с подписками. Подписка и отписка выполняются
+        одним запросом без предварительных проверок.
+        """
+        user = self.request.user
+        if int(pk) == user.id:
             return Response('Нельзя подписаться на самого себя!',
                             status=status.HTTP_400_BAD_REQUEST, )
-        follow = Follow.objects.filter(user=self.request.user, author=author)
 
         if request.method == "POST":
-            if follow.exists():
+            with transaction.atomic():
+                added = add_relations(Follow, 'author', user.id, [int(pk)])
+                if added:
+                    change_counter(User.objects.filter(pk=pk),
+                                   'followers_count', 1)
+            author = get_object_or_404(
+                self.get_subscribed_authors(User.objects.all()), pk=pk)
+            if not added:
                 return Response('Вы уже подписаны на этого автора!',
                                 status=status.HTTP_400_BAD_REQUEST, )
-
-            new_follow = Follow(author=author, user=self.request.user)
-            new_follow.save()
-
-            serializer = self.get_serializer(author)
-
-            recipes = Recipe.objects.filter(author__id=pk)
-            recipes_serializer = RecipeBaseSerializer(recipes, many=True,
-                                                      read_only=True)
-            data = serializer.data
-            data['recipes'] = recipes_serializer.data
-            return Response(data)
+            serializer = SubscriptionSerializer(
+                author, context=self.get_serializer_context())
+            return Response(serializer.data)
         else:
-            if not follow.exists():
+            with transaction.atomic():
+                removed = remove_relations(Follow, 'author', user.id,
+                                           [int(pk)])
+                if removed:
+                    change_counter(User.objects.filter(pk=pk),
+                                   'followers_count', -1)
+            if not removed:
+                get_object_or_404(User, pk=pk)
                 return Response('Вы не подписаны на этого автора!',
                                 status=status.HTTP_400_BAD_REQUEST, )
-            follow.delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False, url_path='me')
@@ -0,0 +1,19 @@
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+
+application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+from api.search import ingredient_index, recipe_index  # noqa: E402
+
+if settings.INGREDIENT_SEARCH_INDEX:
+    ingredient_index.warm_up()
+recipe_index.warm_up()
+
+from django.db import connections  # noqa: E402
+
+connections.close_all()
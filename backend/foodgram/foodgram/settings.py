@@ -35,6 +35,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.QueryCountMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -58,6 +59,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
+ASGI_APPLICATION = 'foodgram.asgi.application'
 
 DATABASES = {
     'default': {
@@ -66,7 +68,20 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', 'db'),
-        'PORT': os.getenv('DB_PORT', '5432')
+        'PORT': os.getenv('DB_PORT', '5432'),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv(
+            'DB_DISABLE_SERVER_SIDE_CURSORS', 'False') == 'True',
+    }
+}
+DB_CONN_HEALTH_CHECKS = os.getenv('DB_CONN_HEALTH_CHECKS', 'False') == 'True'
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
     }
 }
 
@@ -103,12 +118,79 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'backend_media')
 
 AUTH_USER_MODEL = 'users.User'
 
+RECIPE_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+RECIPE_IMAGE_MAX_SIDE = 8000
+RECIPE_IMAGE_QUALITY = 85
+RECIPE_IMAGE_WORKERS = int(os.getenv('RECIPE_IMAGE_WORKERS', 2))
+RECIPE_IMAGE_VARIANTS = {
+    'thumbnail': {'width': 480},
+    'thumbnail_webp': {'width': 480, 'format': 'WEBP'},
+    'webp': {'format': 'WEBP'},
+}
+
+REFERENCE_CACHE_TIMEOUT = 60 * 60 * 24
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', 50))
+INGREDIENT_SEARCH_INDEX = os.getenv('INGREDIENT_SEARCH_INDEX',
+                                    'False') == 'True'
+
+SHOPPING_CART_PDF_FONT = os.getenv(
+    'PDF_FONT_PATH', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+
+QUERY_INSTRUMENTATION = os.getenv('QUERY_INSTRUMENTATION',
+                                  'False') == 'True'
+QUERY_N_PLUS_ONE_THRESHOLD = 3
+
+# Структурированные логи запросов к базе (api.middleware) пишутся одной
+# JSON-строкой на запрос в stdout, откуда их забирает сборщик логов.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'queries': {
+            'class': 'logging.StreamHandler',
+            'stream': 'ext://sys.stdout',
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'api.queries': {
+            'handlers': ['queries'],
+            'level': os.getenv('QUERY_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+RELATION_CACHE_TIMEOUT = int(os.getenv('RELATION_CACHE_TIMEOUT', 0))
+
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', 300))
+TOKEN_CACHE_SHARED = os.getenv('TOKEN_CACHE_SHARED', 'False') == 'True'
+
+# Конфигурация полнотекстового поиска рецептов в PostgreSQL,
+# соответствует LANGUAGE_CODE.
+RECIPE_SEARCH_CONFIG = 'russian'
+# Сколько слов запроса учитывается при поиске без PostgreSQL.
+RECIPE_SEARCH_MAX_WORDS = 10
+# Сколько рецептов возвращает подбор по ингредиентам по умолчанию.
+RECIPE_MATCH_LIMIT = 20
+
+RECIPE_TRENDING_WINDOW_DAYS = 14
+RECIPE_TRENDING_HALF_LIFE_HOURS = 48
+RECIPE_TRENDING_WEIGHTS = {'favorites': 1.0, 'shopping': 0.5}
+
 REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
@@ -5,3 +5,17 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+from api.search import ingredient_index, recipe_index  # noqa: E402
+
+if settings.INGREDIENT_SEARCH_INDEX:
+    ingredient_index.warm_up()
+recipe_index.warm_up()
+
+# При preload_app в gunicorn приложение загружается до fork, соединения
+# с базой не должны достаться рабочим процессам от мастера.
+from django.db import connections  # noqa: E402
+
+connections.close_all()
@@ -0,0 +1,19 @@
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0:8000')
+# Версии кеша (api.cache) сбрасываются только в общем кеше: с кешем в
+# памяти процесса по умолчанию запускается один воркер.
+shared_cache = 'locmem' not in os.getenv('CACHE_BACKEND', 'locmem')
+workers = int(os.getenv('GUNICORN_WORKERS', (
+    multiprocessing.cpu_count() + 1 if shared_cache else 1)))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+# Для ASGI: GUNICORN_APP=foodgram.asgi:application и
+# GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS',
+                         'gthread' if threads > 1 else 'sync')
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
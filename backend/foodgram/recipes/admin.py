@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 from .models import (FavoritesList, Ingredient, IngredientRecipe, Recipe,
-                     ShoppingList, Tag)
+                     RecipeScore, ShoppingCartIngredient, ShoppingList, Tag)
 
 
 class TagInline(admin.TabularInline):
@@ -15,18 +15,14 @@ class IngredientInline(admin.TabularInline):
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     """Настройки отображения модели Recipe в интерфейсе админки."""
-    list_display = ('name', 'author', 'is_favourite_count',)
+    list_display = ('name', 'author', 'favorites_count', 'shopping_count',)
     list_filter = ('name', 'author', 'tags',)
+    list_select_related = ('author',)
+    readonly_fields = ('favorites_count', 'shopping_count',)
     empty_value_display = '-пусто-'
 
     inlines = [TagInline, IngredientInline, ]
 
-    def is_favourite_count(self, obj):
-        return FavoritesList.objects.filter(recipe=obj).count()
-
-    is_favourite_count.short_description = (
-        'Встречается в избранном')
-
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
@@ -39,3 +35,12 @@ admin.site.register(Tag)
 admin.site.register(FavoritesList)
 admin.site.register(ShoppingList)
 admin.site.register(IngredientRecipe)
+admin.site.register(ShoppingCartIngredient)
+
+
+@admin.register(RecipeScore)
+class RecipeScoreAdmin(admin.ModelAdmin):
+    """Настройки отображения модели RecipeScore в интерфейсе админки."""
+    list_display = ('recipe', 'trending', 'updated',)
+    list_select_related = ('recipe',)
+    readonly_fields = ('recipe', 'trending', 'updated',)
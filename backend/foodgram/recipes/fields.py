@@ -0,0 +1,26 @@
+from django.db import models
+from django.db.models import Lookup
+
+
+class SearchVectorField(models.Field):
+    """
+    Столбец tsvector для полнотекстового поиска в PostgreSQL. На других
+    СУБД создается текстовый столбец, который остается пустым.
+    """
+    description = 'Поисковый вектор'
+
+    def db_type(self, connection):
+        if connection.vendor == 'postgresql':
+            return 'tsvector'
+        return 'text'
+
+
+@SearchVectorField.register_lookup
+class SearchMatch(Lookup):
+    """Проверка search_vector__matches=<tsquery>, оператор @@."""
+    lookup_name = 'matches'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} @@ {rhs}', [*lhs_params, *rhs_params]
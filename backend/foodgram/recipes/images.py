@@ -0,0 +1,119 @@
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+IMAGE_FORMATS = {'PNG': 'png', 'JPEG': 'jpg', 'GIF': 'gif', 'WEBP': 'webp'}
+
+executor = ThreadPoolExecutor(max_workers=settings.RECIPE_IMAGE_WORKERS,
+                              thread_name_prefix='recipe-images')
+
+
+def decode_image(data_uri):
+    """
+    Декодирует картинку из data URI один раз. Размер проверяется до
+    декодирования, формат и габариты до сохранения. Имя файла строится
+    по хешу содержимого.
+    """
+    try:
+        _, payload = data_uri.split(';base64,', 1)
+    except ValueError:
+        raise ValidationError('Картинка должна быть в формате base64!')
+    if len(payload) * 3 // 4 > settings.RECIPE_IMAGE_MAX_BYTES:
+        raise ValidationError(
+            f'Размер картинки превышает '
+            f'{settings.RECIPE_IMAGE_MAX_BYTES // (1024 * 1024)} МБ!')
+    try:
+        content = base64.b64decode(payload, validate=True)
+    except (binascii.Error, ValueError):
+        raise ValidationError('Картинка должна быть в формате base64!')
+
+    try:
+        with Image.open(io.BytesIO(content)) as image:
+            image_format, (width, height) = image.format, image.size
+            image.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError):
+        raise ValidationError('Файл не является картинкой!')
+    if image_format not in IMAGE_FORMATS:
+        raise ValidationError(f'Формат {image_format} не поддерживается!')
+    if max(width, height) > settings.RECIPE_IMAGE_MAX_SIDE:
+        raise ValidationError(
+            f'Размер картинки больше '
+            f'{settings.RECIPE_IMAGE_MAX_SIDE} пикселей по стороне!')
+
+    digest = hashlib.sha256(content).hexdigest()
+    return ContentFile(content,
+                       name=f'{digest}.{IMAGE_FORMATS[image_format]}')
+
+
+def variant_name(name, variant, image_format):
+    base, _ = os.path.splitext(name)
+    return f'{base}_{variant}.{IMAGE_FORMATS[image_format]}'
+
+
+def render_variant(image, width, image_format):
+    if width and image.width > width:
+        image = image.resize((width, round(image.height * width
+                                           / image.width)),
+                             Image.LANCZOS)
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, optimize=True,
+               quality=settings.RECIPE_IMAGE_QUALITY)
+    return buffer.getvalue()
+
+
+def generate_variants(recipe_id, name, overwrite=False):
+    """
+    Строит уменьшенные копии и WebP-версии картинки рецепта и
+    записывает их имена в Recipe.image_variants. Готовые файлы
+    перестраиваются только с overwrite.
+    """
+    from .models import Recipe
+
+    storage = Recipe._meta.get_field('image').storage
+    try:
+        with storage.open(name) as source:
+            original = Image.open(source)
+            original_format = original.format
+            image = ImageOps.exif_transpose(original)
+            image.load()
+        variants = {}
+        for variant, options in settings.RECIPE_IMAGE_VARIANTS.items():
+            image_format = options.get('format', original_format)
+            target = variant_name(name, variant, image_format)
+            if overwrite or not storage.exists(target):
+                storage.save_variant(target, ContentFile(
+                    render_variant(image, options.get('width'),
+                                   image_format)), overwrite=overwrite)
+            variants[variant] = target
+        Recipe.objects.filter(id=recipe_id, image=name).update(
+            image_variants=variants)
+    except Exception:
+        logger.exception(f'Не удалось обработать картинку {name}')
+
+
+def generate_variants_in_worker(recipe_id, name):
+    try:
+        generate_variants(recipe_id, name)
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(recipe):
+    """Ставит обработку картинки в пул после фиксации транзакции."""
+    recipe_id, name = recipe.id, recipe.image.name
+    transaction.on_commit(lambda: executor.submit(
+        generate_variants_in_worker, recipe_id, name))
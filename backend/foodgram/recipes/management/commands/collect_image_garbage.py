@@ -0,0 +1,76 @@
+import os
+import re
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+from django.utils import timezone
+from recipes.models import Recipe
+
+HASH_NAME = re.compile(r'[0-9a-f]{64}')
+
+
+class Command(BaseCommand):
+    """Удаление файлов картинок, на которые не ссылается ни один рецепт."""
+    help = ('Находит в каталоге картинок рецептов файлы без ссылок из '
+            'базы (вместе с их уменьшенными копиями) и удаляет их.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать файлы, которые будут удалены.')
+        parser.add_argument(
+            '--min-age', type=int, default=60,
+            help='Не трогать файлы моложе указанного числа минут.')
+
+    def walk(self, storage, directory):
+        directories, files = storage.listdir(directory)
+        for file in files:
+            yield os.path.join(directory, file)
+        for subdirectory in directories:
+            yield from self.walk(storage, os.path.join(directory,
+                                                       subdirectory))
+
+    def is_referenced(self, name, stems):
+        """
+        Файл нужен, если на него ссылается рецепт: как на картинку или
+        как на вариант. Варианты картинок с именем по хешу (<хеш>_<вариант>)
+        сохраняются и до записи в image_variants. У старых картинок вроде
+        temp.png и temp_0XLKz8G.png общий префикс ничего не значит.
+        """
+        stem = os.path.splitext(name)[0]
+        if stem in stems:
+            return True
+        directory, filename = os.path.split(stem)
+        digest, separator, _ = filename.partition('_')
+        return (bool(separator) and HASH_NAME.fullmatch(digest) is not None
+                and os.path.join(directory, digest) in stems)
+
+    def handle(self, *args, **options):
+        field = Recipe._meta.get_field('image')
+        storage, directory = field.storage, field.upload_to.rstrip('/')
+        if not storage.exists(directory):
+            self.stdout.write('Каталог с картинками пуст.')
+            return
+
+        stems = set()
+        for name, variants in Recipe.objects.values_list(
+                'image', 'image_variants').iterator():
+            stems.update(os.path.splitext(file)[0]
+                         for file in (name, *variants.values()) if file)
+        threshold = timezone.now() - timedelta(minutes=options['min_age'])
+        orphans = [
+            name for name in self.walk(storage, directory)
+            if not self.is_referenced(name, stems)
+            and storage.get_modified_time(name) < threshold
+        ]
+
+        freed = 0
+        for name in orphans:
+            freed += storage.size(name)
+            if options['dry_run']:
+                self.stdout.write(name)
+            else:
+                storage.delete(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Найдено" if options["dry_run"] else "Удалено"} файлов без '
+            f'ссылок: {len(orphans)}, {freed / (1024 * 1024):.1f} МБ.'))
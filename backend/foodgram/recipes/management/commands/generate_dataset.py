@@ -0,0 +1,191 @@
+import io
+import random
+import time
+
+from api.cache import bump_version
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import transaction
+from PIL import Image
+from recipes.models import (FavoritesList, Ingredient, IngredientRecipe,
+                            Recipe, ShoppingList, Tag)
+from users.models import Follow, User
+
+TAG_COLORS = ('#E26C2D', '#49B64E', '#8775D2', '#F2C12E', '#2E9CF2',
+              '#D23F6C', '#5BC0BE', '#7A7A7A')
+
+
+class Command(BaseCommand):
+    """Генерация воспроизводимого синтетического набора данных."""
+    help = ('Создает пользователей, подписки со степенным распределением, '
+            'рецепты с тегами и ингредиентами, избранное и корзины. '
+            'С одинаковым --seed на пустой базе получается одинаковый '
+            'набор данных.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000,
+                            help='Количество пользователей.')
+        parser.add_argument('--recipes', type=int, default=5000,
+                            help='Количество рецептов.')
+        parser.add_argument('--tags', type=int, default=8,
+                            help='Количество тегов.')
+        parser.add_argument('--follows', type=float, default=10,
+                            help='Среднее число подписок пользователя.')
+        parser.add_argument('--favorites', type=float, default=20,
+                            help='Среднее число рецептов в избранном.')
+        parser.add_argument('--cart', type=float, default=5,
+                            help='Среднее число рецептов в корзине.')
+        parser.add_argument('--seed', type=int, default=1,
+                            help='Начальное значение генератора.')
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Количество строк в одной пачке вставки.')
+
+    def power_law(self, mean, limit):
+        """Случайная величина с тяжелым хвостом и заданным средним."""
+        alpha = 2.0
+        value = (self.random.paretovariate(alpha) - 1) * mean * (alpha - 1)
+        return min(int(round(value)), limit)
+
+    def weighted_sample(self, population, weights, size):
+        """Выборка без повторов с учетом весов."""
+        chosen = {}
+        for _ in range(3):
+            if len(chosen) >= size:
+                break
+            chosen.update(dict.fromkeys(self.random.choices(
+                population, weights, k=size - len(chosen))))
+        return list(chosen)[:size]
+
+    def create_tags(self, count):
+        tags = list(Tag.objects.order_by('id')[:count])
+        for index in range(len(tags), count):
+            tags.append(Tag.objects.create(
+                name=f'Тег {index + 1}', slug=f'tag-{index + 1}',
+                color=TAG_COLORS[index % len(TAG_COLORS)]))
+        return [tag.id for tag in tags]
+
+    def ingredient_ids(self):
+        if not Ingredient.objects.exists():
+            Ingredient.objects.bulk_create(
+                Ingredient(name=f'ингредиент {index}', measurement_unit='г')
+                for index in range(2000))
+        return list(Ingredient.objects.order_by('id').values_list(
+            'id', flat=True))
+
+    def image_name(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), (230, 120, 40)).save(buffer, 'PNG')
+        return Recipe._meta.get_field('image').storage.save(
+            'recipes_images/dataset.png', ContentFile(buffer.getvalue()))
+
+    def create_follows(self, user_ids, author_weights, mean, batch_size):
+        follows = []
+        for user_id in user_ids:
+            follows += [
+                Follow(user_id=user_id, author_id=author_id)
+                for author_id in self.weighted_sample(
+                    user_ids, author_weights,
+                    self.power_law(mean, len(user_ids) - 1))
+                if author_id != user_id]
+        Follow.objects.bulk_create(follows, batch_size=batch_size)
+        return len(follows)
+
+    def create_recipes(self, user_ids, author_weights, count, batch_size):
+        image = self.image_name()
+        authors = self.random.choices(user_ids, author_weights, k=count)
+        Recipe.objects.bulk_create(
+            (Recipe(author_id=author_id, name=f'Рецепт {index}',
+                    text='Описание рецепта. ' * 10, image=image,
+                    cooking_time=self.random.randint(5, 180))
+             for index, author_id in enumerate(authors)),
+            batch_size=batch_size)
+        return list(Recipe.objects.filter(author_id__in=user_ids).order_by(
+            'id').values_list('id', flat=True))
+
+    def fill_recipes(self, recipe_ids, tag_ids, ingredient_ids, batch_size):
+        recipe_tags, recipe_ingredients = [], []
+        for recipe_id in recipe_ids:
+            recipe_tags += [
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                for tag_id in self.random.sample(
+                    tag_ids, self.random.randint(1, min(3, len(tag_ids))))]
+            recipe_ingredients += [
+                IngredientRecipe(recipe_id=recipe_id,
+                                 ingredient_id=ingredient_id,
+                                 amount=self.random.randint(1, 500))
+                for ingredient_id in self.random.sample(
+                    ingredient_ids,
+                    min(self.random.randint(3, 12), len(ingredient_ids)))]
+        Recipe.tags.through.objects.bulk_create(recipe_tags,
+                                                batch_size=batch_size)
+        IngredientRecipe.objects.bulk_create(recipe_ingredients,
+                                             batch_size=batch_size)
+
+    def create_lists(self, model, user_ids, recipe_ids, recipe_weights,
+                     mean, batch_size):
+        rows = [model(user_id=user_id, recipe_id=recipe_id)
+                for user_id in user_ids
+                for recipe_id in self.weighted_sample(
+                    recipe_ids, recipe_weights,
+                    self.power_law(mean, len(recipe_ids)))]
+        model.objects.bulk_create(rows, batch_size=batch_size)
+        return len(rows)
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 or options['recipes'] < 1:
+            raise CommandError('Нужно хотя бы 2 пользователя и 1 рецепт.')
+        self.random = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        prefix = f'bench{options["seed"]}'
+        if User.objects.filter(username__startswith=f'{prefix}_').exists():
+            raise CommandError(f'Набор данных с --seed {options["seed"]} '
+                               f'уже создан.')
+        started = time.monotonic()
+
+        with transaction.atomic():
+            tag_ids = self.create_tags(options['tags'])
+            ingredient_ids = self.ingredient_ids()
+            password = make_password('benchmark')
+            User.objects.bulk_create(
+                (User(username=f'{prefix}_{index}',
+                      email=f'{prefix}_{index}@example.com',
+                      first_name='Имя', last_name='Фамилия',
+                      password=password)
+                 for index in range(options['users'])),
+                batch_size=batch_size)
+            user_ids = list(User.objects.filter(
+                username__startswith=f'{prefix}_').order_by(
+                'id').values_list('id', flat=True))
+
+            # Популярность авторов и рецептов распределена по степенному
+            # закону: немногие собирают большую часть подписок и закладок.
+            author_weights = [self.random.paretovariate(1.2)
+                              for _ in user_ids]
+            follows = self.create_follows(user_ids, author_weights,
+                                          options['follows'], batch_size)
+            recipe_ids = self.create_recipes(
+                user_ids, author_weights, options['recipes'], batch_size)
+            self.fill_recipes(recipe_ids, tag_ids, ingredient_ids,
+                              batch_size)
+            recipe_weights = [self.random.paretovariate(1.2)
+                              for _ in recipe_ids]
+            favorites = self.create_lists(
+                FavoritesList, user_ids, recipe_ids, recipe_weights,
+                options['favorites'], batch_size)
+            cart = self.create_lists(
+                ShoppingList, user_ids, recipe_ids, recipe_weights,
+                options['cart'], batch_size)
+
+        bump_version('recipe_ingredients')
+        self.stdout.write(
+            f'Пользователей: {len(user_ids)}, подписок: {follows}, '
+            f'рецептов: {len(recipe_ids)}, в избранном: {favorites}, '
+            f'в корзинах: {cart}.')
+        call_command('reconcile_counters', stdout=io.StringIO(),
+                     stderr=io.StringIO())
+        call_command('rebuild_shopping_carts', stdout=self.stdout)
+        call_command('update_recipe_scores', stdout=self.stdout)
+        call_command('update_search_vectors', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Набор данных создан за {time.monotonic() - started:.1f} с.'))
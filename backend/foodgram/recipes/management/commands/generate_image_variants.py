@@ -0,0 +1,30 @@
+from django.core.management import BaseCommand
+from recipes.images import generate_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """Построение уменьшенных и WebP-версий картинок рецептов."""
+    help = ('Строит варианты картинок для рецептов, у которых их еще нет. '
+            'С ключом --all перестраивает варианты для всех рецептов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Перестроить варианты всех рецептов, в том числе уже '
+                 'существующие файлы.')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_variants={})
+        processed, rebuilt = 0, set()
+        for recipe_id, name in recipes.values_list('id', 'image').iterator():
+            # Одна картинка может быть у нескольких рецептов, ее файлы
+            # перестраиваются один раз.
+            generate_variants(recipe_id, name, overwrite=(
+                options['all'] and name not in rebuilt))
+            rebuilt.add(name)
+            processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {processed}.'))
@@ -1,30 +1,149 @@
+import csv
+import io
+import json
 import logging
+import os
+import time
 from csv import DictReader
+from itertools import islice
 
-from django.core.management import BaseCommand
+from api.cache import bump_version
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
 from recipes.models import Ingredient
 
-files_to_download = {
-    Ingredient: './data/ingredients.csv',
-}
+DEFAULT_FILE = './data/ingredients.csv'
 logging.basicConfig(level=logging.INFO)
 
 
 class Command(BaseCommand):
-    """Загрузка данных из csv в таблицы моделей проекта."""
-    help = 'Загрузка данных из .csv в модели проекта.'
+    """Загрузка ингредиентов из csv или json в таблицу модели Ingredient."""
+    help = 'Загрузка ингредиентов из .csv или .json в модель Ingredient.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'files', nargs='*', default=[DEFAULT_FILE],
+            help='Файлы .csv или .json с полями name и measurement_unit.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество строк в одной пачке вставки.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Прочитать и проверить файлы, ничего не записывая в базу.')
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Не использовать COPY на PostgreSQL, только bulk_create.')
+
+    def read_rows(self, file):
+        """Построчно читает файл и отдает пары (name, measurement_unit)."""
+        extension = os.path.splitext(file)[1].lower()
+        with open(file, encoding='utf8') as source:
+            if extension == '.json':
+                rows = json.load(source)
+            elif extension == '.csv':
+                rows = DictReader(source)
+            else:
+                raise CommandError(f'Неподдерживаемый формат файла: {file}')
+            for row in rows:
+                name = (row.get('name') or '').strip()
+                measurement_unit = (row.get('measurement_unit') or '').strip()
+                if not name or not measurement_unit:
+                    logging.info(f'Пропущена строка c данными {row}')
+                    continue
+                yield name, measurement_unit
+
+    def unique_rows(self, rows):
+        """Отбрасывает повторы по ограничению unique ingredient."""
+        seen = set()
+        for row in rows:
+            if row not in seen:
+                seen.add(row)
+                yield row
+
+    def batches(self, rows, batch_size):
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def report(self, processed, started):
+        elapsed = time.monotonic() - started
+        logging.info(f'Обработано строк: {processed} '
+                     f'({processed / elapsed:.0f} строк/с)')
+
+    def load_bulk(self, rows, batch_size, dry_run, started):
+        """Вставляет строки пачками через bulk_create."""
+        processed = 0
+        for batch in self.batches(rows, batch_size):
+            if not dry_run:
+                Ingredient.objects.bulk_create(
+                    [Ingredient(name=name, measurement_unit=measurement_unit)
+                     for name, measurement_unit in batch],
+                    ignore_conflicts=True)
+            processed += len(batch)
+            self.report(processed, started)
+        return processed
+
+    def load_copy(self, rows, batch_size, started):
+        """
+        Загружает строки во временную таблицу через COPY и переносит их
+        в таблицу ингредиентов одним INSERT ... ON CONFLICT DO NOTHING.
+        """
+        processed = 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE ingredient_import '
+                '(name varchar(200), measurement_unit varchar(20)) '
+                'ON COMMIT DROP')
+            for batch in self.batches(rows, batch_size):
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    'COPY ingredient_import (name, measurement_unit) '
+                    'FROM STDIN WITH (FORMAT csv)', buffer)
+                processed += len(batch)
+                self.report(processed, started)
+            cursor.execute(
+                f'INSERT INTO {Ingredient._meta.db_table} '
+                f'(name, measurement_unit) '
+                f'SELECT name, measurement_unit FROM ingredient_import '
+                f'ON CONFLICT DO NOTHING')
+        return processed
 
     def handle(self, *args, **options):
-        for model, file in files_to_download.items():
+        batch_size = options['batch_size']
+        if batch_size <= 0:
+            raise CommandError('Размер пачки должен быть больше нуля!')
+        dry_run = options['dry_run']
+        use_copy = (connection.vendor == 'postgresql'
+                    and not options['no_copy'] and not dry_run)
+
+        for file in options['files']:
+            logging.info(f'Загрузка данных из файла {file} в модель '
+                         f'{Ingredient.__name__}'
+                         f'{" (COPY)" if use_copy else ""}'
+                         f'{" (пробный запуск)" if dry_run else ""}...')
+            started = time.monotonic()
+            before = Ingredient.objects.count()
+
+            with transaction.atomic():
+                rows = self.unique_rows(self.read_rows(file))
+                if use_copy:
+                    processed = self.load_copy(rows, batch_size, started)
+                else:
+                    processed = self.load_bulk(rows, batch_size, dry_run,
+                                               started)
+
+            if not dry_run:
+                bump_version('ingredients')
+            elapsed = time.monotonic() - started
+            inserted = Ingredient.objects.count() - before
             logging.info(
-                f'Загрузка данных из файла {file} в модель {model}...')
-
-            for row in DictReader(open(f'{file}', encoding='utf8')):
-                try:
-                    obj = model(**row)
-                    obj.save()
-                except Exception as err:
-                    logging.info(
-                        f'Не загружена строка c данными {row.values()} '
-                        f'по причине - {err}')
+                f'Файл {file}: уникальных строк {processed}, '
+                f'добавлено {inserted}, за {elapsed:.2f} с '
+                f'({processed / elapsed if elapsed else processed:.0f} '
+                f'строк/с).')
         logging.info('Загрузка данных завершена!')
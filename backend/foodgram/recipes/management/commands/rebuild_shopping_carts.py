@@ -0,0 +1,63 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+from recipes.models import IngredientRecipe, ShoppingCartIngredient
+
+
+class Command(BaseCommand):
+    """Пересчет или проверка суммарных ингредиентов в корзинах."""
+    help = ('Пересчитывает таблицу ингредиентов в корзинах пользователей '
+            'по спискам покупок. С ключом --verify только проверяет её.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только сравнить таблицу с пересчитанными значениями.')
+
+    def expected_amounts(self):
+        rows = IngredientRecipe.objects.filter(
+            recipe__shopping__isnull=False).values(
+            'recipe__shopping__user', 'ingredient').annotate(
+            total=Sum('amount')).values_list(
+            'recipe__shopping__user', 'ingredient', 'total')
+        return {(user_id, ingredient_id): total
+                for user_id, ingredient_id, total in rows.iterator()}
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            expected = self.expected_amounts()
+            actual = {
+                (user_id, ingredient_id): amount
+                for user_id, ingredient_id, amount in
+                ShoppingCartIngredient.objects.values_list(
+                    'user_id', 'ingredient_id', 'amount').iterator()
+            }
+            mismatches = [
+                (user_id, ingredient_id)
+                for user_id, ingredient_id in {*expected, *actual}
+                if expected.get((user_id, ingredient_id))
+                != actual.get((user_id, ingredient_id))
+            ]
+            for user_id, ingredient_id in mismatches:
+                self.stderr.write(
+                    f'Пользователь {user_id}, ингредиент {ingredient_id}: '
+                    f'ожидалось {expected.get((user_id, ingredient_id))}, '
+                    f'в таблице {actual.get((user_id, ingredient_id))}')
+            if mismatches:
+                raise CommandError(
+                    f'Найдено расхождений: {len(mismatches)}. '
+                    f'Запустите команду без --verify для пересчета.')
+            self.stdout.write(self.style.SUCCESS('Расхождений не найдено.'))
+            return
+
+        with transaction.atomic():
+            expected = self.expected_amounts()
+            ShoppingCartIngredient.objects.all().delete()
+            ShoppingCartIngredient.objects.bulk_create(
+                (ShoppingCartIngredient(user_id=user_id,
+                                        ingredient_id=ingredient_id,
+                                        amount=amount)
+                 for (user_id, ingredient_id), amount in expected.items()),
+                batch_size=1000)
+        self.stdout.write(self.style.SUCCESS(
+            f'Корзины пересчитаны, строк: {len(expected)}.'))
@@ -0,0 +1,59 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from recipes.models import FavoritesList, Recipe, ShoppingList
+from users.models import Follow, User
+
+
+def count_related(model, field):
+    """Подзапрос с количеством строк model, ссылающихся на объект."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by()
+        .values(field).annotate(total=Count('pk')).values('total')), 0)
+
+
+class Command(BaseCommand):
+    """Сверка денормализованных счетчиков рецептов и пользователей."""
+    help = ('Пересчитывает счетчики избранного, списков покупок, рецептов '
+            'и подписчиков там, где они разошлись с данными. С ключом '
+            '--verify только проверяет их.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только найти расхождения, ничего не исправляя.')
+
+    def counters(self):
+        return (
+            (Recipe, 'favorites_count', count_related(FavoritesList,
+                                                      'recipe')),
+            (Recipe, 'shopping_count', count_related(ShoppingList,
+                                                     'recipe')),
+            (User, 'recipes_count', count_related(Recipe, 'author')),
+            (User, 'followers_count', count_related(Follow, 'author')),
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        with transaction.atomic():
+            for model, field, actual in self.counters():
+                stale = model.objects.annotate(actual=actual).exclude(
+                    **{field: F('actual')})
+                if options['verify']:
+                    found = stale.count()
+                else:
+                    found = model.objects.filter(
+                        pk__in=stale.values('pk')).update(**{field: actual})
+                if found:
+                    self.stderr.write(
+                        f'{model.__name__}.{field}: расхождений {found}')
+                total += found
+
+        if options['verify'] and total:
+            raise CommandError(
+                f'Найдено расхождений: {total}. '
+                f'Запустите команду без --verify для пересчета.')
+        self.stdout.write(self.style.SUCCESS(
+            f'Счетчики сверены, исправлено: {total}.'
+            if not options['verify'] else 'Расхождений не найдено.'))
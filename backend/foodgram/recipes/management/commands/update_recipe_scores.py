@@ -0,0 +1,50 @@
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from recipes.models import FavoritesList, RecipeScore, ShoppingList
+
+
+class Command(BaseCommand):
+    """Пересчет таблицы популярности рецептов."""
+    help = ('Пересчитывает популярность рецептов по добавлениям в '
+            'избранное и списки покупок с затуханием по времени. '
+            'Запускается по расписанию, например из cron.')
+
+    def scores(self, now):
+        """
+        Складывает веса добавлений за окно RECIPE_TRENDING_WINDOW_DAYS,
+        вес добавления уменьшается вдвое каждые
+        RECIPE_TRENDING_HALF_LIFE_HOURS часов.
+        """
+        since = now - timedelta(days=settings.RECIPE_TRENDING_WINDOW_DAYS)
+        half_life = timedelta(
+            hours=settings.RECIPE_TRENDING_HALF_LIFE_HOURS).total_seconds()
+        weights = settings.RECIPE_TRENDING_WEIGHTS
+        scores = defaultdict(float)
+        for model, weight in ((FavoritesList, weights['favorites']),
+                              (ShoppingList, weights['shopping'])):
+            rows = model.objects.filter(created__gte=since).values_list(
+                'recipe_id', 'created')
+            for recipe_id, created in rows.iterator():
+                age = (now - created).total_seconds()
+                scores[recipe_id] += weight * 0.5 ** (age / half_life)
+        return scores
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        now = timezone.now()
+        scores = self.scores(now)
+        with transaction.atomic():
+            RecipeScore.objects.all().delete()
+            RecipeScore.objects.bulk_create(
+                (RecipeScore(recipe_id=recipe_id, trending=score, updated=now)
+                 for recipe_id, score in scores.items()),
+                batch_size=1000)
+        self.stdout.write(self.style.SUCCESS(
+            f'Популярность пересчитана для {len(scores)} рецептов '
+            f'за {time.monotonic() - started:.2f} с.'))
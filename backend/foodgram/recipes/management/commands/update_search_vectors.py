@@ -0,0 +1,23 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import connection
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """Пересчет поисковых векторов рецептов."""
+    help = ('Заполняет search_vector всех рецептов. Нужен после массовой '
+            'загрузки рецептов и смены RECIPE_SEARCH_CONFIG. '
+            'Работает только на PostgreSQL.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write('Поисковые векторы используются только в '
+                              'PostgreSQL, пересчет не нужен.')
+            return
+        started = time.monotonic()
+        Recipe.update_search_vectors()
+        self.stdout.write(self.style.SUCCESS(
+            f'Поисковые векторы пересчитаны за '
+            f'{time.monotonic() - started:.1f} с.'))
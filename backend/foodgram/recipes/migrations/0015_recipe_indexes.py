@@ -0,0 +1,48 @@
+# Generated by Django 3.2.18 on 2026-10-18 12:00
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def deduplicate_tag_slugs(apps, schema_editor):
+    """
+    Перед уникальным индексом по slug объединяет теги с одинаковым slug:
+    рецепты переносятся на тег с меньшим id, лишние теги удаляются.
+    """
+    Tag = apps.get_model('recipes', 'Tag')
+    RecipeTag = apps.get_model('recipes', 'Recipe').tags.through
+    duplicates = Tag.objects.values('slug').annotate(
+        count=Count('id'), keep=Min('id')).filter(count__gt=1)
+    for row in duplicates:
+        for tag_id in Tag.objects.filter(slug=row['slug']).exclude(
+                id=row['keep']).values_list('id', flat=True):
+            RecipeTag.objects.filter(tag_id=tag_id).exclude(
+                recipe_id__in=RecipeTag.objects.filter(
+                    tag_id=row['keep']).values('recipe_id')).update(
+                tag_id=row['keep'])
+            Tag.objects.filter(id=tag_id).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_ingredient_name_trgm'),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate_tag_slugs,
+                             migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tag',
+            name='slug',
+            field=models.SlugField(unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date', '-id'], name='recipe_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date'], name='recipe_author_pub_date_idx'),
+        ),
+    ]
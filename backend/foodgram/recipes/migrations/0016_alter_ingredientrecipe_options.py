@@ -0,0 +1,17 @@
+# Generated by Django 3.2.18 on 2026-10-18 13:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_recipe_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='ingredientrecipe',
+            options={'verbose_name': 'Ингредиенты в рецептах'},
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.18 on 2026-10-18 15:00
+
+from django.db import migrations, models
+import recipes.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0017_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(max_length=1024, storage=recipes.storage.ContentAddressedStorage(), upload_to='recipes_images/', verbose_name='Картинка'),
+        ),
+    ]
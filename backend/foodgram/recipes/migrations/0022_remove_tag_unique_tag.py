@@ -0,0 +1,17 @@
+# Generated by Django 3.2.18 on 2026-10-18 20:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0021_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='tag',
+            name='unique tag',
+        ),
+    ]
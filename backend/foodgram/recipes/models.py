@@ -1,23 +1,30 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Greatest
+
+from .fields import SearchVectorField
+from .storage import recipe_image_storage
 
 User = get_user_model()
 
 
+def change_counter(queryset, field, delta):
+    """Атомарно изменяет счетчик в строках queryset, не опуская ниже нуля."""
+    return queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
 class Tag(models.Model):
     """Модель для работы с тегами."""
     name = models.CharField(max_length=200, verbose_name='Имя', )
     color = models.CharField(max_length=16, verbose_name='Цвет', )
-    slug = models.SlugField(max_length=50, )
+    slug = models.SlugField(max_length=50, unique=True, )
 
     def __str__(self):
         return self.name
 
     class Meta:
-        constraints = [
-            models.UniqueConstraint(fields=['name', 'color', 'slug', ],
-                                    name='unique tag', )
-        ]
         verbose_name = 'Тег'
         verbose_name_plural = 'Теги'
 
@@ -50,8 +57,12 @@ class Recipe(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='recipes_images/',
+        storage=recipe_image_storage,
         max_length=1024,
     )
+    image_variants = models.JSONField(default=dict,
+                                      blank=True,
+                                      verbose_name='Варианты картинки', )
     text = models.TextField()
     ingredients = models.ManyToManyField(Ingredient,
                                          through='IngredientRecipe',
@@ -64,12 +75,60 @@ class Recipe(models.Model):
         verbose_name='Время приготовления, мин.', )
     pub_date = models.DateTimeField(auto_now_add=True,
                                     verbose_name='Дата публикации', )
+    favorites_count = models.PositiveIntegerField(
+        default=0, verbose_name='Встречается в избранном', )
+    shopping_count = models.PositiveIntegerField(
+        default=0, verbose_name='Добавлений в список покупок', )
+    search_vector = SearchVectorField(null=True,
+                                      editable=False,
+                                      verbose_name='Поисковый вектор', )
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def update_search_vectors(cls, recipe_ids=None):
+        """
+        Пересчитывает поисковые векторы рецептов (всех, если recipe_ids
+        не передан): название с весом A, ингредиенты с весом B, описание
+        с весом C. Работает только на PostgreSQL.
+        """
+        if connection.vendor != 'postgresql':
+            return
+        qn = connection.ops.quote_name
+        recipe = qn(cls._meta.db_table)
+        sql = (
+            f'UPDATE {recipe} SET search_vector = '
+            f"setweight(to_tsvector(%(config)s::regconfig, name), 'A') || "
+            f'setweight(to_tsvector(%(config)s::regconfig, coalesce(('
+            f"SELECT string_agg(ingredient.name, ' ') "
+            f'FROM {qn(IngredientRecipe._meta.db_table)} AS item '
+            f'JOIN {qn(Ingredient._meta.db_table)} AS ingredient '
+            f'ON ingredient.id = item.ingredient_id '
+            f"WHERE item.recipe_id = {recipe}.id), '')), 'B') || "
+            f"setweight(to_tsvector(%(config)s::regconfig, text), 'C')")
+        params = {'config': settings.RECIPE_SEARCH_CONFIG}
+        if recipe_ids is not None:
+            recipe_ids = list(recipe_ids)
+            if not recipe_ids:
+                return
+            sql += ' WHERE id = ANY(%(ids)s)'
+            params['ids'] = recipe_ids
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
     class Meta:
         ordering = ("-pub_date",)
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='recipe_pub_date_idx', ),
+            models.Index(fields=['author', '-pub_date'],
+                         name='recipe_author_pub_date_idx', ),
+            models.Index(fields=['-favorites_count', '-id'],
+                         name='recipe_favorites_count_idx', ),
+            models.Index(fields=['-shopping_count', '-id'],
+                         name='recipe_shopping_count_idx', ),
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -94,13 +153,13 @@ class IngredientRecipe(models.Model):
             models.UniqueConstraint(fields=['ingredient', 'recipe'],
                                     name='unique ingredient_recipe', )
         ]
-
-    class Meta:
         verbose_name = 'Ингредиенты в рецептах'
 
 
 class ShoppingList(models.Model):
     """Модель для работы со списком покупок."""
+    counter_field = 'shopping_count'
+
     user = models.ForeignKey(User,
                              on_delete=models.CASCADE,
                              verbose_name='Пользователь',
@@ -109,6 +168,9 @@ class ShoppingList(models.Model):
                                on_delete=models.CASCADE,
                                verbose_name='Рецепт',
                                related_name='shopping', )
+    created = models.DateTimeField(auto_now_add=True,
+                                   db_index=True,
+                                   verbose_name='Дата добавления', )
 
     def __str__(self):
         return f'{self.user} - {self.recipe}'
@@ -124,6 +186,8 @@ class ShoppingList(models.Model):
 
 class FavoritesList(models.Model):
     """Модель для работы со списком избранного."""
+    counter_field = 'favorites_count'
+
     user = models.ForeignKey(User,
                              on_delete=models.CASCADE,
                              verbose_name='Пользователь',
@@ -132,6 +196,9 @@ class FavoritesList(models.Model):
                                on_delete=models.CASCADE,
                                verbose_name='Рецепт',
                                related_name='favorites')
+    created = models.DateTimeField(auto_now_add=True,
+                                   db_index=True,
+                                   verbose_name='Дата добавления', )
 
     def __str__(self):
         return f'{self.user} - {self.recipe}'
@@ -143,3 +210,117 @@ class FavoritesList(models.Model):
         ]
         verbose_name = 'Список избранного'
         verbose_name_plural = 'Списки избранного'
+
+
+class RecipeScore(models.Model):
+    """
+    Предварительно вычисленная популярность рецепта. Заполняется командой
+    update_recipe_scores по активности в избранном и списках покупок.
+    """
+    recipe = models.OneToOneField(Recipe,
+                                  on_delete=models.CASCADE,
+                                  primary_key=True,
+                                  verbose_name='Рецепт',
+                                  related_name='score', )
+    trending = models.FloatField(verbose_name='Популярность', )
+    updated = models.DateTimeField(verbose_name='Дата пересчета', )
+
+    def __str__(self):
+        return f'{self.recipe} - {self.trending:.2f}'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-trending', '-recipe'],
+                         name='recipe_score_trending_idx', ),
+        ]
+        verbose_name = 'Популярность рецепта'
+        verbose_name_plural = 'Популярность рецептов'
+
+
+class ShoppingCartIngredient(models.Model):
+    """
+    Модель с суммарным количеством ингредиентов в корзине пользователя.
+    Обновляется сигналами ShoppingList и IngredientRecipe, а пакетные
+    операции без сигналов обновляют ее сами.
+    """
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             verbose_name='Пользователь',
+                             related_name='shopping_cart_ingredients', )
+    ingredient = models.ForeignKey(Ingredient,
+                                   on_delete=models.CASCADE,
+                                   verbose_name='Ингредиент',
+                                   related_name='shopping_cart_ingredients', )
+    amount = models.PositiveIntegerField(verbose_name='Количество', )
+
+    def __str__(self):
+        return f'{self.user} - {self.ingredient}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'ingredient'],
+                                    name='unique shopping_cart_ingredient', )
+        ]
+        verbose_name = 'Ингредиент в корзине'
+        verbose_name_plural = 'Ингредиенты в корзинах'
+
+    @staticmethod
+    def recipe_amounts(*recipes):
+        """Возвращает суммарные количества ингредиентов рецептов по их id."""
+        return dict(IngredientRecipe.objects.filter(
+            recipe__in=recipes).values('ingredient').annotate(
+            total=Sum('amount')).values_list('ingredient', 'total'))
+
+    @classmethod
+    def add_amounts(cls, user_ids, amounts):
+        """
+        Прибавляет количества ингредиентов к корзинам пользователей,
+        отрицательные количества вычитаются. Опустевшие строки удаляются.
+        """
+        user_ids = list(user_ids)
+        amounts = {ingredient_id: amount
+                   for ingredient_id, amount in amounts.items() if amount}
+        if not user_ids or not amounts:
+            return
+        with transaction.atomic():
+            # Строки создаются только для прибавляемых ингредиентов:
+            # вычитание не должно заводить строки, например, в корзине
+            # удаляемого пользователя.
+            cls.objects.bulk_create(
+                [cls(user_id=user_id, ingredient_id=ingredient_id, amount=0)
+                 for user_id in user_ids
+                 for ingredient_id, amount in amounts.items() if amount > 0],
+                ignore_conflicts=True)
+            cls.objects.filter(
+                user_id__in=user_ids, ingredient_id__in=amounts).update(
+                amount=Greatest(F('amount') + Case(
+                    *[When(ingredient_id=ingredient_id, then=Value(amount))
+                      for ingredient_id, amount in amounts.items()],
+                    output_field=IntegerField()), 0))
+            cls.objects.filter(user_id__in=user_ids, amount=0).delete()
+
+    @classmethod
+    def add_recipes(cls, user, recipes):
+        """Добавляет ингредиенты рецептов в корзину пользователя."""
+        cls.add_amounts([user.id], cls.recipe_amounts(*recipes))
+
+    @classmethod
+    def remove_recipes(cls, user, recipes):
+        """Вычитает ингредиенты рецептов из корзины пользователя."""
+        amounts = cls.recipe_amounts(*recipes)
+        cls.add_amounts([user.id], {ingredient_id: -amount for
+                                    ingredient_id, amount in amounts.items()})
+
+    @classmethod
+    def update_recipe(cls, recipe, old_amounts, new_amounts):
+        """
+        Применяет изменение состава рецепта к корзинам всех пользователей,
+        добавивших его в список покупок.
+        """
+        amounts = {
+            ingredient_id: (new_amounts.get(ingredient_id, 0)
+                            - old_amounts.get(ingredient_id, 0))
+            for ingredient_id in {*old_amounts, *new_amounts}
+        }
+        cls.add_amounts(ShoppingList.objects.filter(recipe=recipe).values_list(
+            'user_id', flat=True), amounts)
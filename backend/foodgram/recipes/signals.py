@@ -0,0 +1,198 @@
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+from users.models import Follow, User
+
+from .models import (FavoritesList, Ingredient, IngredientRecipe, Recipe,
+                     ShoppingCartIngredient, ShoppingList, change_counter)
+
+
+def release_image(name, variants):
+    """
+    Удаляет файл картинки и ее варианты, если на картинку больше не
+    ссылается ни один рецепт.
+    """
+    def in_use():
+        return Recipe.objects.filter(image=name).exists()
+
+    if not name or in_use():
+        return
+    Recipe._meta.get_field('image').storage.delete_with_variants(
+        name, variants.values(), in_use)
+
+
+@receiver(post_init, sender=Recipe)
+def remember_image(sender, instance, **kwargs):
+    image = instance.__dict__.get('image')
+    instance._loaded_image = image if isinstance(image, str) else None
+    instance._loaded_variants = dict(
+        instance.__dict__.get('image_variants') or {})
+
+
+@receiver(post_save, sender=Recipe)
+def image_replaced(sender, instance, **kwargs):
+    """Освобождает прежнюю картинку рецепта после ее замены."""
+    old_name = getattr(instance, '_loaded_image', None)
+    old_variants = getattr(instance, '_loaded_variants', {})
+    instance._loaded_image = instance.image.name
+    instance._loaded_variants = dict(instance.image_variants)
+    if old_name and old_name != instance.image.name:
+        transaction.on_commit(lambda: release_image(old_name, old_variants))
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    """Освобождает картинку удаленного рецепта и ее варианты."""
+    name, variants = instance.image.name, dict(instance.image_variants)
+    transaction.on_commit(lambda: release_image(name, variants))
+
+
+def update_search_on_commit(recipe_ids):
+    """
+    Пересчитывает поисковые векторы рецептов после фиксации транзакции,
+    когда пакетно добавленные строки состава уже сохранены.
+    """
+    recipe_ids = list(recipe_ids)
+    transaction.on_commit(lambda: Recipe.update_search_vectors(recipe_ids))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, update_fields=None, **kwargs):
+    """Обновляет поисковый вектор рецепта при изменении его текста."""
+    if update_fields is None or {'name', 'text'} & set(update_fields):
+        update_search_on_commit([instance.id])
+
+
+@receiver((post_save, post_delete), sender=IngredientRecipe)
+def recipe_composition_changed(sender, instance, **kwargs):
+    """Обновляет поисковый вектор рецепта при изменении его состава."""
+    update_search_on_commit([instance.recipe_id])
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    """Обновляет поисковые векторы рецептов с переименованным ингредиентом."""
+    if not created:
+        update_search_on_commit(IngredientRecipe.objects.filter(
+            ingredient=instance).values_list('recipe_id', flat=True))
+
+
+def negate(amounts):
+    return {ingredient_id: -amount
+            for ingredient_id, amount in amounts.items()}
+
+
+# Поля строк, от которых зависят суммарные корзины.
+CART_FIELDS = {
+    IngredientRecipe: ('ingredient_id', 'amount'),
+    ShoppingList: ('user_id', 'recipe_id'),
+}
+
+
+@receiver(pre_save, sender=ShoppingList)
+@receiver(pre_save, sender=IngredientRecipe)
+def remember_row(sender, instance, **kwargs):
+    """Запоминает сохраненные значения строки перед ее изменением."""
+    instance._old_row = None
+    if instance.pk:
+        instance._old_row = sender.objects.filter(pk=instance.pk).values_list(
+            *CART_FIELDS[sender]).first()
+
+
+@receiver(post_save, sender=IngredientRecipe)
+def recipe_ingredient_saved(sender, instance, **kwargs):
+    """Переносит изменение количества ингредиента в корзины с рецептом."""
+    old = instance.__dict__.pop('_old_row', None)
+    new = (instance.ingredient_id, instance.amount)
+    if old != new:
+        ShoppingCartIngredient.update_recipe(
+            instance.recipe_id, dict([old]) if old else {}, dict([new]))
+
+
+# Удаление рецепта каскадно удаляет и строки состава, и строки корзин, в
+# порядке, который выбирает Django. Оба обработчика читают уже
+# обновленную базу: строка корзины вычитает оставшийся состав рецепта,
+# строка состава вычитается из оставшихся корзин, поэтому каждое
+# количество вычитается ровно один раз при любом порядке.
+@receiver(post_delete, sender=IngredientRecipe)
+def recipe_ingredient_deleted(sender, instance, **kwargs):
+    """Вычитает удаленный ингредиент рецепта из корзин с рецептом."""
+    ShoppingCartIngredient.update_recipe(
+        instance.recipe_id, {instance.ingredient_id: instance.amount}, {})
+
+
+@receiver(post_save, sender=ShoppingList)
+def shopping_list_saved(sender, instance, **kwargs):
+    """Переносит рецепт в корзину пользователя, в том числе из прежней."""
+    old = instance.__dict__.pop('_old_row', None)
+    new = (instance.user_id, instance.recipe_id)
+    if old == new:
+        return
+    if old:
+        ShoppingCartIngredient.add_amounts(
+            [old[0]], negate(ShoppingCartIngredient.recipe_amounts(old[1])))
+    ShoppingCartIngredient.add_amounts(
+        [instance.user_id],
+        ShoppingCartIngredient.recipe_amounts(instance.recipe_id))
+
+
+@receiver(post_delete, sender=ShoppingList)
+def shopping_list_deleted(sender, instance, **kwargs):
+    """Вычитает ингредиенты рецепта из корзины пользователя."""
+    ShoppingCartIngredient.add_amounts(
+        [instance.user_id],
+        negate(ShoppingCartIngredient.recipe_amounts(instance.recipe_id)))
+
+
+# Счетчики строк, которые ссылаются на объект: поле ссылки, модель
+# объекта и поле счетчика. API меняет связи сырым SQL без сигналов и
+# обновляет счетчики сам, здесь учитываются записи через ORM и админку.
+COUNTERS = {
+    FavoritesList: ('recipe_id', Recipe, 'favorites_count'),
+    ShoppingList: ('recipe_id', Recipe, 'shopping_count'),
+    Recipe: ('author_id', User, 'recipes_count'),
+    Follow: ('author_id', User, 'followers_count'),
+}
+
+
+def move_counter(sender, old, new):
+    """Переносит единицу счетчика со старого объекта на новый."""
+    _, model, field = COUNTERS[sender]
+    if old == new:
+        return
+    if old is not None:
+        change_counter(model.objects.filter(pk=old), field, -1)
+    if new is not None:
+        change_counter(model.objects.filter(pk=new), field, 1)
+
+
+@receiver(post_init, sender=Follow)
+@receiver(post_init, sender=Recipe)
+@receiver(post_init, sender=FavoritesList)
+@receiver(post_init, sender=ShoppingList)
+def remember_counted(sender, instance, **kwargs):
+    """Запоминает объект, счетчик которого учитывает строку."""
+    instance._counted = instance.__dict__.get(COUNTERS[sender][0])
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=FavoritesList)
+@receiver(post_save, sender=ShoppingList)
+def counted_row_saved(sender, instance, created, **kwargs):
+    """Учитывает новую строку или перенос строки на другой объект."""
+    new = instance.__dict__.get(COUNTERS[sender][0])
+    old = None if created else instance._counted
+    if created or old is not None:
+        move_counter(sender, old, new)
+        instance._counted = new
+
+
+@receiver(post_delete, sender=Follow)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=FavoritesList)
+@receiver(post_delete, sender=ShoppingList)
+def counted_row_deleted(sender, instance, **kwargs):
+    """Вычитает удаленную строку из счетчика объекта."""
+    move_counter(sender, instance._counted, None)
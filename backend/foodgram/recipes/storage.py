@@ -0,0 +1,84 @@
+import hashlib
+import os
+import uuid
+
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Файловое хранилище, раскладывающее файлы по хешу содержимого:
+    <каталог>/<первые два символа хеша>/<хеш>.<расширение>.
+    Повторная загрузка того же файла не создает новую копию.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        hexdigest = digest.hexdigest()
+        name = '/'.join(
+            part for part in (directory, hexdigest[:2],
+                              f'{hexdigest}{extension}') if part)
+        if self.exists(name):
+            # Файл может освобождать рецепт из параллельной транзакции.
+            # Если его удалят до фиксации этой, он записывается заново.
+            data = content.read()
+            content.seek(0)
+            transaction.on_commit(
+                lambda: self.save_variant(name, ContentFile(data)))
+            return name
+        return super().save(name, content, max_length)
+
+    def save_variant(self, name, content, overwrite=False):
+        """
+        Сохраняет файл под заданным именем, без переименования по хешу:
+        производные копии картинок и файлы, удаленные параллельной
+        транзакцией. Существующий файл перезаписывается только с
+        overwrite.
+        """
+        if self.exists(name):
+            if not overwrite:
+                return name
+            self.delete(name)
+        return super().save(name, content)
+
+    def delete_with_variants(self, name, variants=(), in_use=None):
+        """
+        Удаляет файл вместе с его производными копиями. Удаляются только
+        файлы с именами из variants, чужие файлы с похожими именами
+        остаются на месте. Файлы сначала переносятся в сторону, и если
+        in_use() показывает, что картинку тем временем снова сохранил
+        другой рецепт, возвращаются на место.
+        """
+        moved = []
+        for file in (name, *variants):
+            directory, filename = os.path.split(file)
+            aside = os.path.join(directory,
+                                 f'deleted-{uuid.uuid4().hex}-{filename}')
+            try:
+                os.replace(self.path(file), self.path(aside))
+            except FileNotFoundError:
+                continue
+            moved.append((file, aside))
+        restore = in_use is not None and in_use()
+        for file, aside in moved:
+            if restore:
+                os.replace(self.path(aside), self.path(file))
+            else:
+                self.delete(aside)
+
+
+recipe_image_storage = ContentAddressedStorage()
@@ -0,0 +1,79 @@
+import os
+import tempfile
+
+import pytest
+from django.conf import settings
+from django.core.cache import cache
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.test import APIClient
+from users.models import User
+
+
+@pytest.fixture(scope='session')
+def django_db_modify_db_settings():
+    """
+    Тесты с потоками обращаются к базе из разных соединений, поэтому
+    тестовая база SQLite создается в файле, а не в памяти.
+    """
+    database = settings.DATABASES['default']
+    if database['ENGINE'].endswith('sqlite3'):
+        database['TEST']['NAME'] = os.path.join(
+            tempfile.gettempdir(), f'test_foodgram_{os.getpid()}.sqlite3')
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Версии и закешированные ответы не переходят между тестами."""
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def fast_password_hasher(settings):
+    settings.PASSWORD_HASHERS = [
+        'django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@pytest.fixture
+def make_user(db):
+    def make_user(username):
+        return User.objects.create_user(
+            username=username, email=f'{username}@example.com',
+            password='password', first_name=username, last_name=username)
+    return make_user
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user('user')
+
+
+@pytest.fixture
+def author(make_user):
+    return make_user('author')
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def tag(db):
+    return Tag.objects.create(name='Завтрак', color='#E26C2D',
+                              slug='breakfast')
+
+
+@pytest.fixture
+def ingredients(db):
+    return [Ingredient.objects.create(name=f'сахар {index}',
+                                      measurement_unit='г')
+            for index in range(5)]
+
+
+@pytest.fixture
+def recipe(author):
+    return Recipe.objects.create(author=author, name='Рецепт',
+                                 text='Описание', cooking_time=10,
+                                 image='recipes_images/recipe.png')
@@ -0,0 +1,58 @@
+import pytest
+from recipes.models import FavoritesList, Recipe, ShoppingList
+
+MODELS = {'favorite': FavoritesList, 'shopping_cart': ShoppingList}
+
+
+@pytest.fixture
+def recipes(author):
+    return [Recipe.objects.create(author=author, name=f'Рецепт {index}',
+                                  text='Описание', cooking_time=10,
+                                  image='recipes_images/recipe.png')
+            for index in range(3)]
+
+
+def statuses(response):
+    assert response.status_code == 200
+    return [(item['id'], item['status'])
+            for item in response.json()['results']]
+
+
+@pytest.mark.parametrize('relation', MODELS)
+def test_bulk_add_and_remove(user, user_client, recipes, relation):
+    url = f'/api/recipes/{relation}/bulk/'
+    first, second, third = (recipe.id for recipe in recipes)
+    missing = third + 100
+    MODELS[relation].objects.create(user=user, recipe=recipes[0])
+
+    assert statuses(user_client.post(url, {
+        'recipes': [first, second, second, missing]}, format='json')) == [
+        (first, 'exists'), (second, 'added'), (missing, 'not_found')]
+    assert set(MODELS[relation].objects.filter(user=user).values_list(
+        'recipe_id', flat=True)) == {first, second}
+    recipes[1].refresh_from_db()
+    assert getattr(recipes[1], MODELS[relation].counter_field) == 1
+
+    assert statuses(user_client.delete(url, {
+        'recipes': [second, third, missing]}, format='json')) == [
+        (second, 'removed'), (third, 'missing'), (missing, 'not_found')]
+    assert list(MODELS[relation].objects.filter(user=user).values_list(
+        'recipe_id', flat=True)) == [first]
+    recipes[1].refresh_from_db()
+    assert getattr(recipes[1], MODELS[relation].counter_field) == 0
+
+
+@pytest.mark.parametrize('recipes_ids', ([], ['x'], [0], list(range(1, 102))),
+                         ids=('empty', 'not_number', 'zero', 'too_many'))
+def test_bulk_validates_ids(user_client, recipes_ids):
+    response = user_client.post('/api/recipes/favorite/bulk/',
+                                {'recipes': recipes_ids}, format='json')
+    assert response.status_code == 400
+    assert not FavoritesList.objects.exists()
+
+
+def test_bulk_requires_authentication(client, recipes):
+    response = client.post('/api/recipes/favorite/bulk/',
+                           {'recipes': [recipes[0].id]},
+                           content_type='application/json')
+    assert response.status_code == 401
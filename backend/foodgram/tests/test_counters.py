@@ -0,0 +1,54 @@
+from recipes.models import FavoritesList, Recipe, ShoppingList
+from rest_framework.test import APIClient
+from users.models import Follow
+
+
+def counters(recipe, author):
+    recipe.refresh_from_db()
+    author.refresh_from_db()
+    return (recipe.favorites_count, recipe.shopping_count,
+            author.recipes_count, author.followers_count)
+
+
+def test_orm_writes_update_counters(user, author, recipe):
+    """Связи, измененные через ORM, как в админке."""
+    assert counters(recipe, author) == (0, 0, 1, 0)
+    favorite = FavoritesList.objects.create(user=user, recipe=recipe)
+    ShoppingList.objects.create(user=user, recipe=recipe)
+    Follow.objects.create(user=user, author=author)
+    assert counters(recipe, author) == (1, 1, 1, 1)
+
+    other = Recipe.objects.create(author=author, name='Другой',
+                                  text='Описание', cooking_time=5,
+                                  image='recipes_images/recipe.png')
+    favorite.recipe = other
+    favorite.save()
+    favorite.save()
+    assert counters(recipe, author) == (0, 1, 2, 1)
+    assert counters(other, author) == (1, 0, 2, 1)
+
+    other.author = user
+    other.save()
+    user.refresh_from_db()
+    assert counters(recipe, author) == (0, 1, 1, 1)
+    assert user.recipes_count == 1
+
+    user.delete()
+    assert counters(recipe, author) == (0, 0, 1, 0)
+    recipe.delete()
+    author.refresh_from_db()
+    assert author.recipes_count == 0
+
+
+def test_api_does_not_double_count(user_client, author, recipe):
+    for url in (f'/api/recipes/{recipe.id}/favorite/',
+                f'/api/recipes/{recipe.id}/shopping_cart/',
+                f'/api/users/{author.id}/subscribe/'):
+        assert user_client.post(url).status_code in (200, 201)
+    assert counters(recipe, author) == (1, 1, 1, 1)
+
+    client = APIClient()
+    client.force_authenticate(author)
+    assert client.delete(f'/api/recipes/{recipe.id}/').status_code == 204
+    author.refresh_from_db()
+    assert author.recipes_count == 0
@@ -0,0 +1,63 @@
+import pytest
+from recipes.models import Recipe
+
+URL = '/api/recipes/'
+
+
+@pytest.fixture
+def recipes(author):
+    for index in range(7):
+        Recipe.objects.create(author=author, name=f'Рецепт {index}',
+                              text='Описание', cooking_time=10,
+                              image='recipes_images/recipe.png')
+    return list(Recipe.objects.order_by('-pub_date', '-id').values_list(
+        'id', flat=True))
+
+
+def ids(response):
+    assert response.status_code == 200
+    return [recipe['id'] for recipe in response.json()['results']]
+
+
+@pytest.mark.parametrize('count, expected', (
+    (None, None), ('none', None), ('exact', 7), ('estimate', 7),
+    ('unknown', None),
+))
+def test_count_modes(user_client, recipes, count, expected):
+    params = {'pagination': 'cursor'}
+    if count is not None:
+        params['count'] = count
+    assert user_client.get(URL, params).json()['count'] == expected
+
+
+def test_count_respects_filters(user_client, user, recipes):
+    response = user_client.get(URL, {'pagination': 'cursor',
+                                     'count': 'exact', 'author': user.id})
+    assert response.json() == {'count': 0, 'next': None, 'previous': None,
+                               'results': []}
+
+
+def test_cursor_walks_all_pages(user_client, recipes):
+    response = user_client.get(URL, {'pagination': 'cursor', 'limit': 3})
+    pages = [ids(response)]
+    while response.json()['next']:
+        response = user_client.get(response.json()['next'])
+        pages.append(ids(response))
+    assert pages == [recipes[:3], recipes[3:6], recipes[6:]]
+
+    previous = user_client.get(response.json()['previous'])
+    assert ids(previous) == recipes[3:6]
+    assert previous.json()['previous'] is not None
+
+
+def test_page_numbers_stay_default(user_client, recipes):
+    data = user_client.get(URL).json()
+    assert data['count'] == 7
+    assert [recipe['id'] for recipe in data['results']] == recipes[:6]
+    assert 'page=2' in data['next']
+
+
+def test_invalid_cursor(user_client, recipes):
+    response = user_client.get(URL, {'pagination': 'cursor',
+                                     'cursor': 'not-a-cursor'})
+    assert response.status_code == 404
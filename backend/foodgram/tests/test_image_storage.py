@@ -0,0 +1,35 @@
+import os
+
+import pytest
+from django.core.files.base import ContentFile
+from recipes.storage import ContentAddressedStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return ContentAddressedStorage(location=str(tmp_path))
+
+
+def test_reused_image_is_restored_at_commit(
+        db, storage, django_capture_on_commit_callbacks):
+    name = storage.save('recipes_images/recipe.png', ContentFile(b'image'))
+    with django_capture_on_commit_callbacks(execute=True):
+        assert storage.save('recipes_images/recipe.png',
+                            ContentFile(b'image')) == name
+        # Параллельная транзакция освободила картинку до фиксации.
+        storage.delete(name)
+    with storage.open(name) as file:
+        assert file.read() == b'image'
+
+
+@pytest.mark.parametrize('in_use', (True, False), ids=('reused', 'released'))
+def test_delete_with_variants_rechecks_usage(storage, in_use):
+    name = storage.save('recipes_images/recipe.png', ContentFile(b'image'))
+    variant = storage.save_variant(f'{name[:-4]}_small.webp',
+                                   ContentFile(b'small'))
+    storage.delete_with_variants(name, [variant], lambda: in_use)
+    assert storage.exists(name) is in_use
+    assert storage.exists(variant) is in_use
+    assert sorted(os.listdir(storage.path(os.path.dirname(name)))) == (
+        sorted([os.path.basename(name), os.path.basename(variant)])
+        if in_use else [])
@@ -0,0 +1,55 @@
+import pytest
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+BEFORE = [('recipes', '0012_alter_recipe_image'),
+          ('users', '0004_auto_20230221_2044')]
+AFTER = [('recipes', '0013_shoppingcartingredient'),
+         ('users', '0004_auto_20230221_2044')]
+
+
+def migrate(targets):
+    executor = MigrationExecutor(connection)
+    executor.migrate(targets or executor.loader.graph.leaf_nodes())
+    executor.loader.build_graph()
+    return executor.loader.project_state(targets).apps if targets else None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_shopping_carts_are_filled_from_existing_lists():
+    try:
+        apps = migrate(BEFORE)
+        User = apps.get_model('users', 'User')
+        Ingredient = apps.get_model('recipes', 'Ingredient')
+        Recipe = apps.get_model('recipes', 'Recipe')
+        IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+        ShoppingList = apps.get_model('recipes', 'ShoppingList')
+
+        author, buyer, other = (
+            User.objects.create(username=name, email=f'{name}@example.com')
+            for name in ('author', 'buyer', 'other'))
+        salt, sugar = (Ingredient.objects.create(name=name,
+                                                 measurement_unit='г')
+                       for name in ('соль', 'сахар'))
+        recipes = [Recipe.objects.create(author=author, name=f'Рецепт {i}',
+                                         text='Описание', cooking_time=10,
+                                         image='recipes_images/recipe.png')
+                   for i in range(2)]
+        for recipe in recipes:
+            IngredientRecipe.objects.create(recipe=recipe, ingredient=salt,
+                                            amount=5)
+        IngredientRecipe.objects.create(recipe=recipes[1], ingredient=sugar,
+                                        amount=7)
+        for recipe in recipes:
+            ShoppingList.objects.create(user=buyer, recipe=recipe)
+        ShoppingList.objects.create(user=other, recipe=recipes[1])
+
+        apps = migrate(AFTER)
+        totals = apps.get_model(
+            'recipes', 'ShoppingCartIngredient').objects.values_list(
+            'user_id', 'ingredient_id', 'amount')
+        assert sorted(totals) == sorted([
+            (buyer.id, salt.id, 10), (buyer.id, sugar.id, 7),
+            (other.id, salt.id, 5), (other.id, sugar.id, 7)])
+    finally:
+        migrate(None)
@@ -0,0 +1,78 @@
+import json
+import logging
+
+import pytest
+from recipes.models import (FavoritesList, IngredientRecipe, Recipe,
+                            ShoppingList)
+from rest_framework.test import APIClient
+from users.models import Follow
+
+from api.management.commands.check_query_budgets import (BUDGETS,
+                                                         format_url)
+from api.testing import query_budget
+
+
+@pytest.fixture
+def dataset(make_user, user, tag, ingredients):
+    """
+    Несколько авторов с несколькими рецептами, избранным, корзиной и
+    подписками: запрос на каждую строку выдачи проявится как повтор.
+    """
+    authors = [make_user(f'author{index}') for index in range(4)]
+    recipes = []
+    for author in authors:
+        Follow.objects.create(user=user, author=author)
+        for index in range(3):
+            recipe = Recipe.objects.create(
+                author=author, name=f'salt {author.username} {index}',
+                text='Описание', cooking_time=10,
+                image='recipes_images/recipe.png')
+            recipe.tags.add(tag)
+            IngredientRecipe.objects.bulk_create(
+                IngredientRecipe(recipe=recipe, ingredient=ingredient,
+                                 amount=10)
+                for ingredient in ingredients[:3])
+            recipes.append(recipe)
+    for recipe in recipes[::2]:
+        FavoritesList.objects.create(user=user, recipe=recipe)
+        ShoppingList.objects.create(user=user, recipe=recipe)
+    return recipes
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url, budget, authenticated', BUDGETS,
+                         ids=[f'{url}{" (auth)" if authenticated else ""}'
+                              for url, _, authenticated in BUDGETS])
+def test_endpoint_query_budget(dataset, user, url, budget, authenticated):
+    client = APIClient()
+    if authenticated:
+        client.force_authenticate(user)
+    url = format_url(url, dataset[0])
+    with query_budget(budget):
+        response = client.get(url)
+        if response.streaming:
+            b''.join(response.streaming_content)
+    assert response.status_code == 200
+    if not response.streaming:
+        assert response.json(), 'Пустая выдача не проверяет бюджет'
+
+
+@pytest.mark.django_db
+def test_query_log_is_written(settings, dataset, user_client):
+    settings.QUERY_INSTRUMENTATION = True
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    logger = logging.getLogger('api.queries')
+    logger.addHandler(handler)
+    try:
+        response = user_client.get('/api/recipes/')
+    finally:
+        logger.removeHandler(handler)
+
+    assert logger.isEnabledFor(logging.INFO)
+    assert len(records) == 1
+    entry = json.loads(records[0].getMessage())
+    assert entry['view'] == 'RecipeViewSet.list'
+    assert entry['queries'] == int(response['X-DB-Query-Count'])
+    assert not entry['n_plus_one']
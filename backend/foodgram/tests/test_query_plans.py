@@ -0,0 +1,86 @@
+import re
+
+import pytest
+from django.conf import settings
+from django.db import connection
+from django.http import QueryDict
+from django.test import RequestFactory
+from recipes.models import FavoritesList, Recipe, ShoppingList, Tag
+
+from api.filters import RecipeFilter
+
+# Полный просмотр таблицы: Seq Scan в PostgreSQL, SCAN без индекса или
+# сортировка всей выборки в SQLite (подзапросы Django обозначает
+# псевдонимами U0, U1...).
+FULL_SCAN = {
+    'postgresql': re.compile(r'Seq Scan on \w+'),
+    'sqlite': re.compile(r'SCAN (?:recipes_\w+|users_\w+|U\d+)\s*$'
+                         r'|USE TEMP B-TREE FOR ORDER BY', re.MULTILINE),
+}
+
+FILTERS = (
+    '',
+    'page=2',
+    'author={author}',
+    'tags=breakfast',
+    'tags=breakfast&tags=dinner',
+    'is_favorited=1',
+    'is_in_shopping_cart=1',
+    'is_favorited=1&tags=breakfast',
+    'author={author}&tags=breakfast&page=2',
+)
+
+
+@pytest.fixture
+def feed(user, author):
+    tags = [Tag.objects.create(name=slug, color='#000000', slug=slug)
+            for slug in ('breakfast', 'dinner')]
+    recipes = [Recipe.objects.create(author=author, name=f'Рецепт {index}',
+                                     text='Описание', cooking_time=10,
+                                     image='recipes_images/recipe.png')
+               for index in range(10)]
+    for recipe in recipes:
+        recipe.tags.set(tags[:1 + recipe.id % 2])
+    FavoritesList.objects.create(user=user, recipe=recipes[0])
+    ShoppingList.objects.create(user=user, recipe=recipes[1])
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # На маленькой таблице планировщик и так выберет Seq Scan,
+            # проверяется, что для запроса вообще есть индекс.
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        elif connection.vendor == 'sqlite':
+            cursor.execute('ANALYZE')
+
+
+def recipe_feed_plan(user, params):
+    request = RequestFactory().get(f'/api/recipes/?{params}')
+    request.user = user
+    data = QueryDict(params)
+    queryset = RecipeFilter(data, queryset=Recipe.objects.all(),
+                            request=request).qs.order_by('-pub_date', '-id')
+    page = int(data.get('page', 1))
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    return queryset[(page - 1) * page_size:page * page_size].explain()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', FILTERS)
+def test_recipe_feed_uses_indexes(feed, user, author, params):
+    plan = recipe_feed_plan(user, params.format(author=author.id))
+    assert not FULL_SCAN[connection.vendor].search(plan), plan
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params, index', (
+    ('', 'recipe_pub_date_idx'),
+    ('author={author}', 'recipe_author_pub_date_idx'),
+))
+def test_recipe_feed_index_names(feed, user, author, params, index):
+    plan = recipe_feed_plan(user, params.format(author=author.id))
+    assert index in plan, plan
+
+
+@pytest.mark.django_db
+def test_tag_slug_lookup_uses_index(feed):
+    plan = Tag.objects.filter(slug='breakfast').explain()
+    assert not FULL_SCAN[connection.vendor].search(plan), plan
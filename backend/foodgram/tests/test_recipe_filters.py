@@ -0,0 +1,42 @@
+import pytest
+from recipes.models import FavoritesList, Recipe, ShoppingList, Tag
+
+URL = '/api/recipes/'
+
+
+@pytest.fixture
+def recipes(author, tag):
+    lunch = Tag.objects.create(name='Обед', color='#49B64E', slug='lunch')
+    recipes = [Recipe.objects.create(author=author, name=f'Рецепт {index}',
+                                     text='Описание', cooking_time=10,
+                                     image='recipes_images/recipe.png')
+               for index in range(3)]
+    recipes[0].tags.set([tag, lunch])
+    recipes[1].tags.set([lunch])
+    return recipes
+
+
+def found(client, params):
+    data = client.get(URL, params).json()
+    ids = sorted(recipe['id'] for recipe in data['results'])
+    assert data['count'] == len(ids)
+    return ids
+
+
+def test_tags_do_not_duplicate_recipes(user_client, recipes):
+    first, second, _ = (recipe.id for recipe in recipes)
+    assert found(user_client, {'tags': ['breakfast', 'lunch']}) == [
+        first, second]
+    assert found(user_client, {'tags': 'breakfast'}) == [first]
+
+
+def test_relation_filters(user, user_client, client, recipes):
+    first, second, third = (recipe.id for recipe in recipes)
+    FavoritesList.objects.create(user=user, recipe=recipes[0])
+    ShoppingList.objects.create(user=user, recipe=recipes[1])
+    assert found(user_client, {'is_favorited': 1}) == [first]
+    assert found(user_client, {'is_favorited': 0}) == [second, third]
+    assert found(user_client, {'is_in_shopping_cart': 1,
+                               'tags': 'lunch'}) == [second]
+    assert found(client, {'is_favorited': 1}) == []
+    assert found(client, {'is_favorited': 0}) == [first, second, third]
@@ -0,0 +1,39 @@
+from recipes.models import FavoritesList, Recipe, ShoppingList, Tag
+from users.models import Follow
+
+
+def test_list_flags_and_nested_data(user, user_client, author, recipe, tag,
+                                    ingredients, make_user):
+    other_author = make_user('other')
+    other = Recipe.objects.create(author=other_author, name='Другой',
+                                  text='Описание', cooking_time=5,
+                                  image='recipes_images/recipe.png')
+    lunch = Tag.objects.create(name='Обед', color='#49B64E', slug='lunch')
+    recipe.tags.set([tag, lunch])
+    recipe.ingredients.add(ingredients[0], through_defaults={'amount': 4})
+    FavoritesList.objects.create(user=user, recipe=recipe)
+    ShoppingList.objects.create(user=user, recipe=other)
+    Follow.objects.create(user=user, author=author)
+
+    results = {item['id']: item for item in user_client.get(
+        '/api/recipes/').json()['results']}
+    assert (results[recipe.id]['is_favorited'],
+            results[recipe.id]['is_in_shopping_cart'],
+            results[recipe.id]['author']['is_subscribed']) == (
+        True, False, True)
+    assert (results[other.id]['is_favorited'],
+            results[other.id]['is_in_shopping_cart'],
+            results[other.id]['author']['is_subscribed']) == (
+        False, True, False)
+    assert [item['slug'] for item in results[recipe.id]['tags']] == [
+        'breakfast', 'lunch']
+    assert [(item['id'], item['amount'])
+            for item in results[recipe.id]['ingredients']] == [
+        (ingredients[0].id, 4)]
+    assert results[other.id]['tags'] == []
+
+
+def test_anonymous_list_has_no_flags(client, recipe):
+    item = client.get('/api/recipes/').json()['results'][0]
+    assert (item['is_favorited'], item['is_in_shopping_cart'],
+            item['author']['is_subscribed']) == (False, False, False)
@@ -0,0 +1,87 @@
+import pytest
+from recipes.models import (IngredientRecipe, Recipe, ShoppingCartIngredient,
+                            ShoppingList)
+from rest_framework.test import APIClient
+
+IMAGE = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAf'
+         'FcSJAAAADUlEQVR42mP8z8DwHwAFBQIAX8jx0gAAAABJRU5ErkJggg==')
+
+
+@pytest.fixture
+def author_client(author, settings, tmp_path, monkeypatch):
+    settings.MEDIA_ROOT = str(tmp_path)
+    monkeypatch.setattr('api.serializers.schedule_variants',
+                        lambda recipe: None)
+    client = APIClient()
+    client.force_authenticate(author)
+    return client
+
+
+def composition(recipe):
+    return dict(IngredientRecipe.objects.filter(recipe=recipe).values_list(
+        'ingredient_id', 'amount'))
+
+
+def payload(tag, amounts):
+    return {'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 10,
+            'tags': [tag.id], 'image': IMAGE,
+            'ingredients': [{'id': ingredient.id, 'amount': amount}
+                            for ingredient, amount in amounts]}
+
+
+def test_create_recipe(author_client, author, tag, ingredients):
+    response = author_client.post('/api/recipes/', payload(
+        tag, [(ingredients[0], 5), (ingredients[1], 3)]), format='json')
+    assert response.status_code == 201
+    recipe = Recipe.objects.get(pk=response.json()['id'])
+    assert composition(recipe) == {ingredients[0].id: 5,
+                                   ingredients[1].id: 3}
+    assert list(recipe.tags.all()) == [tag]
+    assert [item['amount'] for item in response.json()['ingredients']] == [
+        5, 3]
+
+
+@pytest.mark.parametrize('amounts', (
+    lambda ingredients: [(ingredients[0], 5), (ingredients[0], 3)],
+    lambda ingredients: [(ingredients[0], 5), (ingredients[4], 'много')],
+), ids=('duplicate', 'not_number'))
+def test_invalid_composition_creates_nothing(author_client, tag,
+                                             ingredients, amounts):
+    response = author_client.post('/api/recipes/', payload(
+        tag, amounts(ingredients)), format='json')
+    assert response.status_code == 400
+    assert not Recipe.objects.exists()
+    assert not IngredientRecipe.objects.exists()
+
+
+def test_unknown_ingredient_is_rejected(author_client, tag, ingredients):
+    data = payload(tag, [(ingredients[0], 5)])
+    data['ingredients'].append({'id': ingredients[-1].id + 100,
+                                'amount': 1})
+    response = author_client.post('/api/recipes/', data, format='json')
+    assert response.status_code == 400
+    assert not Recipe.objects.exists()
+
+
+def test_update_changes_only_differing_rows(author_client, user, recipe,
+                                            tag, ingredients):
+    IngredientRecipe.objects.create(recipe=recipe, ingredient=ingredients[0],
+                                    amount=5)
+    kept = IngredientRecipe.objects.create(recipe=recipe,
+                                           ingredient=ingredients[1],
+                                           amount=3)
+    IngredientRecipe.objects.create(recipe=recipe, ingredient=ingredients[2],
+                                    amount=1)
+    ShoppingList.objects.create(user=user, recipe=recipe)
+
+    data = payload(tag, [(ingredients[0], 7), (ingredients[1], 3),
+                         (ingredients[3], 2)])
+    del data['image']
+    response = author_client.patch(f'/api/recipes/{recipe.id}/', data,
+                                   format='json')
+    assert response.status_code == 200
+    new = {ingredients[0].id: 7, ingredients[1].id: 3, ingredients[3].id: 2}
+    assert composition(recipe) == new
+    assert IngredientRecipe.objects.filter(pk=kept.pk).exists()
+    assert dict(ShoppingCartIngredient.objects.filter(
+        user=user).values_list('ingredient_id', 'amount')) == new
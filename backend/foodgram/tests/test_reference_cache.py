@@ -0,0 +1,59 @@
+import pytest
+from django.core.cache import cache
+from recipes.models import Ingredient, Tag
+from rest_framework.test import APIClient
+
+
+@pytest.fixture
+def client():
+    return APIClient()
+
+
+def tag_slugs(response):
+    return [tag['slug'] for tag in response.json()]
+
+
+def test_tags_are_cached_until_changed(client, tag,
+                                       django_assert_num_queries):
+    assert tag_slugs(client.get('/api/tags/')) == ['breakfast']
+    with django_assert_num_queries(0):
+        assert tag_slugs(client.get('/api/tags/')) == ['breakfast']
+
+    Tag.objects.create(name='Обед', color='#49B64E', slug='lunch')
+    assert tag_slugs(client.get('/api/tags/')) == ['breakfast', 'lunch']
+
+
+def test_evicted_version_does_not_revive_old_response(client, tag):
+    """
+    Версия, вытесненная из кеша, начинается заново со случайного числа,
+    поэтому после следующего изменения старые ответы не отдаются снова.
+    """
+    client.get('/api/tags/')
+    cache.delete('version:tags')
+    assert tag_slugs(client.get('/api/tags/')) == ['breakfast']
+
+    Tag.objects.create(name='Обед', color='#49B64E', slug='lunch')
+    assert tag_slugs(client.get('/api/tags/')) == ['breakfast', 'lunch']
+
+
+def test_conditional_request_returns_not_modified(client, tag):
+    response = client.get('/api/tags/')
+    etag = response['ETag']
+    assert client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag
+                      ).status_code == 304
+
+    tag.name = 'Ужин'
+    tag.save()
+    response = client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+
+def test_ingredient_search_is_invalidated_on_rename(client, ingredients):
+    url = '/api/ingredients/?name=сахар 0'
+    assert [item['name'] for item in client.get(url).json()] == ['сахар 0']
+
+    ingredients[0].name = 'соль'
+    ingredients[0].save()
+    assert client.get(url).json() == []
+    assert Ingredient.objects.filter(name='соль').exists()
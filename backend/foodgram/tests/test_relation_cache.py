@@ -0,0 +1,75 @@
+import pytest
+from api.cache import relations_key
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.models import FavoritesList, ShoppingList
+from users.models import Follow
+
+
+@pytest.fixture(autouse=True)
+def relation_cache(settings):
+    settings.RELATION_CACHE_TIMEOUT = 60
+
+
+@pytest.fixture
+def committed(django_capture_on_commit_callbacks):
+    """Выполняет отложенные до фиксации сбросы кеша связей."""
+    return lambda: django_capture_on_commit_callbacks(execute=True)
+
+
+def flags(client, recipe):
+    data = client.get(f'/api/recipes/{recipe.id}/').json()
+    return (data['is_favorited'], data['is_in_shopping_cart'],
+            data['author']['is_subscribed'])
+
+
+def test_relations_are_cached(user_client, recipe):
+    with CaptureQueriesContext(connection) as first:
+        flags(user_client, recipe)
+    with CaptureQueriesContext(connection) as second:
+        flags(user_client, recipe)
+    assert len(second) == len(first) - 3
+
+
+def test_api_toggles_invalidate_relations(user_client, recipe, author,
+                                          committed):
+    assert flags(user_client, recipe) == (False, False, False)
+    with committed():
+        user_client.post(f'/api/recipes/{recipe.id}/favorite/')
+        user_client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        user_client.post(f'/api/users/{author.id}/subscribe/')
+    assert flags(user_client, recipe) == (True, True, True)
+
+    with committed():
+        user_client.delete(f'/api/recipes/{recipe.id}/favorite/')
+        user_client.delete('/api/recipes/shopping_cart/')
+    assert flags(user_client, recipe) == (False, False, True)
+
+
+def test_orm_writes_invalidate_relations(user, user_client, recipe, author,
+                                         committed):
+    """Связи, измененные через ORM, как в админке."""
+    assert flags(user_client, recipe) == (False, False, False)
+    with committed():
+        FavoritesList.objects.create(user=user, recipe=recipe)
+        ShoppingList.objects.create(user=user, recipe=recipe)
+        Follow.objects.create(user=user, author=author)
+    assert flags(user_client, recipe) == (True, True, True)
+
+    with committed():
+        recipe.favorites.all().delete()
+    assert flags(user_client, recipe) == (False, True, True)
+
+
+def test_evicted_version_does_not_revive_relations(user, user_client,
+                                                   recipe, committed):
+    with committed():
+        FavoritesList.objects.create(user=user, recipe=recipe)
+    assert flags(user_client, recipe)[0] is True
+    cache.delete(f'version:{relations_key(user.id, "favoriteslist")}')
+    assert flags(user_client, recipe)[0] is True
+
+    with committed():
+        FavoritesList.objects.filter(user=user).delete()
+    assert flags(user_client, recipe)[0] is False
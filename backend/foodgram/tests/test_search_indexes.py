@@ -0,0 +1,38 @@
+from itertools import chain
+
+from api.search import IngredientSearchIndex, RecipeIngredientIndex
+from recipes.models import Ingredient, IngredientRecipe, Recipe
+
+
+def test_ingredient_index_rebuilds_on_version_change(ingredients):
+    index = IngredientSearchIndex()
+    assert [item['name'] for item in index.search('хар 1', 10)] == [
+        'сахар 1']
+
+    Ingredient.objects.create(name='Харчо', measurement_unit='г')
+    assert [item['name'] for item in index.search('хар', 3)] == [
+        'Харчо', 'сахар 0', 'сахар 1']
+    keys, offsets, text, items = index.state
+    assert len(keys) == len(offsets) == len(items) == 6
+    assert text.split('\n') == keys
+
+
+def test_recipe_index_rebuilds_on_version_change(author, recipe,
+                                                 ingredients):
+    index = RecipeIngredientIndex()
+    for ingredient in ingredients[:2]:
+        IngredientRecipe.objects.create(recipe=recipe, ingredient=ingredient,
+                                        amount=1)
+    assert index.match([ingredients[0].id], 10) == [(recipe.id, 1, 2)]
+
+    other = Recipe.objects.create(author=author, name='Другой',
+                                  text='Описание', cooking_time=5,
+                                  image='recipes_images/recipe.png')
+    IngredientRecipe.objects.create(recipe=other, ingredient=ingredients[0],
+                                    amount=1)
+    assert index.match([ingredients[0].id], 10) == [(other.id, 1, 1),
+                                                    (recipe.id, 1, 2)]
+    assert index.match([ingredients[0].id], 10, min_coverage=1) == [
+        (other.id, 1, 1)]
+    postings, sizes = index.state
+    assert set(chain.from_iterable(postings.values())) == set(sizes)
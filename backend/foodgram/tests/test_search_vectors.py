@@ -0,0 +1,62 @@
+import pytest
+from recipes.models import IngredientRecipe, Recipe
+from rest_framework.test import APIClient
+
+
+@pytest.fixture
+def updated(monkeypatch):
+    """Id рецептов, для которых пересчитывались поисковые векторы."""
+    updated = []
+    monkeypatch.setattr(
+        Recipe, 'update_search_vectors',
+        classmethod(lambda cls, recipe_ids=None: updated.extend(recipe_ids)))
+    return updated
+
+
+def test_orm_changes_update_search_vectors(
+        recipe, ingredients, updated, django_capture_on_commit_callbacks):
+    """Правки рецепта и его состава через ORM, как в админке."""
+    with django_capture_on_commit_callbacks(execute=True):
+        row = IngredientRecipe.objects.create(recipe=recipe,
+                                              ingredient=ingredients[0],
+                                              amount=1)
+    assert updated == [recipe.id]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe.name = 'Новое название'
+        recipe.save()
+        row.delete()
+        ingredients[1].save()
+    assert updated == [recipe.id] * 3
+
+    with django_capture_on_commit_callbacks(execute=True):
+        IngredientRecipe.objects.create(recipe=recipe,
+                                        ingredient=ingredients[1], amount=1)
+        ingredients[1].name = 'соль'
+        ingredients[1].save()
+        recipe.save(update_fields=['cooking_time'])
+    assert updated == [recipe.id] * 5
+
+
+def test_api_create_updates_search_vector(
+        author, tag, ingredients, updated, settings, tmp_path, monkeypatch,
+        django_capture_on_commit_callbacks):
+    """Вектор нового рецепта пересчитывается после вставки состава."""
+    settings.MEDIA_ROOT = str(tmp_path)
+    monkeypatch.setattr('api.serializers.schedule_variants',
+                        lambda recipe: None)
+    client = APIClient()
+    client.force_authenticate(author)
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        response = client.post('/api/recipes/', {
+            'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 10,
+            'tags': [tag.id], 'image': (
+                'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAAB'
+                'CAYAAAAfFcSJAAAADUlEQVR42mP8z8DwHwAFBQIAX8jx0gAAAABJRU5E'
+                'rkJggg=='),
+            'ingredients': [{'id': ingredients[0].id, 'amount': 5}],
+        }, format='json')
+        assert response.status_code == 201
+        assert updated == []
+    assert callbacks
+    assert updated == [response.json()['id']]
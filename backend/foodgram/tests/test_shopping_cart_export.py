@@ -0,0 +1,75 @@
+import pytest
+from api.async_views import download_shopping_cart
+from asgiref.sync import async_to_sync
+from django.test import RequestFactory
+from recipes.models import IngredientRecipe, ShoppingList
+from rest_framework.authtoken.models import Token
+
+URL = '/api/recipes/download_shopping_cart/'
+TXT = 'Мой список покупок:\n1: сахар 0 - 5 г\n2: сахар 1 - 3 г\n'
+CSV = ('\ufeffИнгредиент,Количество,Единица измерения\r\n'
+       'сахар 0,5,г\r\nсахар 1,3,г\r\n')
+
+
+@pytest.fixture
+def cart(user, recipe, ingredients):
+    for ingredient, amount in ((ingredients[1], 3), (ingredients[0], 5)):
+        IngredientRecipe.objects.create(recipe=recipe, ingredient=ingredient,
+                                        amount=amount)
+    ShoppingList.objects.create(user=user, recipe=recipe)
+
+
+def download(response):
+    assert response.status_code == 200
+    return b''.join(response.streaming_content)
+
+
+@pytest.mark.parametrize('file_format, content_type, content', (
+    ('txt', 'text/plain; charset=utf-8', TXT),
+    ('csv', 'text/csv; charset=utf-8', CSV),
+), ids=('txt', 'csv'))
+def test_text_exports(user_client, cart, file_format, content_type,
+                      content):
+    response = user_client.get(URL, {'file_format': file_format})
+    assert response['Content-Type'] == content_type
+    assert response['Content-Disposition'] == (
+        f'attachment; filename="my_shopping_cart.{file_format}"')
+    assert download(response).decode() == content
+
+
+def test_default_export_is_txt(user_client, cart):
+    assert download(user_client.get(URL)).decode() == TXT
+
+
+def test_pdf_export(user_client, cart):
+    response = user_client.get(URL, {'file_format': 'pdf'})
+    assert response['Content-Type'] == 'application/pdf'
+    assert download(response).startswith(b'%PDF')
+
+
+def test_unknown_format_is_rejected(user_client, cart):
+    assert user_client.get(URL, {'file_format': 'xls'}).status_code == 400
+
+
+def test_export_requires_authentication(client):
+    assert client.get(URL).status_code == 401
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('file_format', ('txt', 'csv'))
+def test_async_export_matches_sync(user, user_client, cart, file_format):
+    expected = download(user_client.get(URL, {'file_format': file_format}))
+    token = Token.objects.create(user=user)
+    request = RequestFactory().get(
+        URL, {'file_format': file_format},
+        HTTP_AUTHORIZATION=f'Token {token.key}')
+    assert download(async_to_sync(download_shopping_cart)(request)) == (
+        expected)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_export_requires_authentication():
+    response = async_to_sync(download_shopping_cart)(
+        RequestFactory().get(URL))
+    assert response.status_code == 401
+    assert response['WWW-Authenticate'] == 'Token'
@@ -0,0 +1,107 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from recipes.models import (IngredientRecipe, Recipe, ShoppingCartIngredient,
+                            ShoppingList)
+from rest_framework.test import APIClient
+
+
+def assert_totals_match():
+    """Суммарные корзины совпадают с пересчетом по спискам покупок."""
+    call_command('rebuild_shopping_carts', '--verify',
+                 stdout=StringIO(), stderr=StringIO())
+
+
+def cart(user):
+    return dict(ShoppingCartIngredient.objects.filter(
+        user=user).values_list('ingredient_id', 'amount'))
+
+
+@pytest.fixture
+def recipes(author, ingredients):
+    recipes = []
+    for index in range(2):
+        recipe = Recipe.objects.create(
+            author=author, name=f'Рецепт {index}', text='Описание',
+            cooking_time=10, image='recipes_images/recipe.png')
+        for ingredient in ingredients[index:index + 3]:
+            IngredientRecipe.objects.create(recipe=recipe,
+                                            ingredient=ingredient, amount=10)
+        recipes.append(recipe)
+    return recipes
+
+
+@pytest.fixture
+def carts(user, author, recipes):
+    for owner in (user, author):
+        for recipe in recipes:
+            ShoppingList.objects.create(user=owner, recipe=recipe)
+    assert_totals_match()
+
+
+def test_orm_edits_keep_cart_totals(user, ingredients, recipes, carts):
+    """Правки состава и списков покупок через ORM, как в админке."""
+    first, second = recipes
+    row = IngredientRecipe.objects.get(recipe=first,
+                                       ingredient=ingredients[1])
+    row.amount = 25
+    row.save()
+    assert cart(user)[ingredients[1].id] == 35
+    row.ingredient = ingredients[4]
+    row.save()
+    IngredientRecipe.objects.create(recipe=second, ingredient=ingredients[0],
+                                    amount=5)
+    IngredientRecipe.objects.get(recipe=first,
+                                 ingredient=ingredients[0]).delete()
+    assert_totals_match()
+
+    entry = ShoppingList.objects.get(user=user, recipe=second)
+    entry.delete()
+    ShoppingList.objects.get(user=user, recipe=first).delete()
+    assert cart(user) == {}
+    entry = ShoppingList.objects.create(user=user, recipe=first)
+    entry.recipe = second
+    entry.save()
+    assert_totals_match()
+
+
+@pytest.mark.parametrize('delete', (
+    lambda objects: objects['recipe'].delete(),
+    lambda objects: Recipe.objects.all().delete(),
+    lambda objects: objects['author'].delete(),
+    lambda objects: objects['user'].delete(),
+    lambda objects: objects['ingredient'].delete(),
+), ids=('recipe', 'recipes', 'author', 'user', 'ingredient'))
+def test_cascades_keep_cart_totals(user, author, ingredients, recipes, carts,
+                                   delete):
+    """Каскадные удаления вычитают каждое количество ровно один раз."""
+    delete({'recipe': recipes[0], 'author': author, 'user': user,
+            'ingredient': ingredients[2]})
+    assert_totals_match()
+
+
+def test_api_changes_keep_cart_totals(user, author, user_client, tag,
+                                      ingredients, recipes):
+    first, second = recipes
+    for recipe in recipes:
+        response = user_client.post(f'/api/recipes/{recipe.id}/'
+                                    f'shopping_cart/')
+        assert response.status_code == 200
+    assert_totals_match()
+
+    author_client = APIClient()
+    author_client.force_authenticate(author)
+    response = author_client.patch(f'/api/recipes/{first.id}/', {
+        'name': first.name, 'text': first.text, 'cooking_time': 10,
+        'tags': [tag.id], 'image': first.image.name,
+        'ingredients': [{'id': ingredients[1].id, 'amount': 7},
+                        {'id': ingredients[4].id, 'amount': 3}],
+    }, format='json')
+    assert response.status_code == 200
+    assert_totals_match()
+
+    response = author_client.delete(f'/api/recipes/{second.id}/')
+    assert response.status_code == 204
+    assert cart(user) == {ingredients[1].id: 7, ingredients[4].id: 3}
+    assert_totals_match()
@@ -0,0 +1,46 @@
+import pytest
+from recipes.models import Recipe
+from users.models import Follow
+
+URL = '/api/users/subscriptions/'
+
+
+@pytest.fixture
+def authors(user, make_user):
+    authors = [make_user(f'author{index}') for index in range(2)]
+    for author, count in zip(authors, (3, 1)):
+        for index in range(count):
+            Recipe.objects.create(author=author, name=f'Рецепт {index}',
+                                  text='Описание', cooking_time=10,
+                                  image='recipes_images/recipe.png')
+        Follow.objects.create(user=user, author=author)
+    return authors
+
+
+def newest(author, limit=None):
+    return list(Recipe.objects.filter(author=author).order_by(
+        '-pub_date', '-id').values_list('id', flat=True)[:limit])
+
+
+def feed(client, **params):
+    return {item['id']: item for item in client.get(
+        URL, params).json()['results']}
+
+
+@pytest.mark.parametrize('limit', ('2', None, 'all'))
+def test_recipes_limit(user_client, authors, limit):
+    params = {} if limit is None else {'recipes_limit': limit}
+    items = feed(user_client, **params)
+    assert list(items) == [author.id for author in authors]
+    for author, count in zip(authors, (3, 1)):
+        item = items[author.id]
+        assert item['recipes_count'] == count
+        assert item['is_subscribed'] is True
+        assert sorted(recipe['id'] for recipe in item['recipes']) == sorted(
+            newest(author, 2 if limit == '2' else None))
+
+
+def test_only_own_subscriptions(user_client, authors, make_user):
+    Follow.objects.create(user=make_user('reader'), author=authors[0])
+    Follow.objects.filter(author=authors[1]).delete()
+    assert list(feed(user_client)) == [authors[0].id]
@@ -0,0 +1,63 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.db import close_old_connections
+from recipes.models import FavoritesList, ShoppingList
+from rest_framework.test import APIClient
+from users.models import Follow
+
+WORKERS = 8
+
+
+def fire(user, method, url):
+    """Отправляет WORKERS одинаковых запросов одновременно."""
+    barrier = threading.Barrier(WORKERS)
+
+    def request(_):
+        client = APIClient()
+        client.force_authenticate(user)
+        barrier.wait()
+        try:
+            return getattr(client, method)(url).status_code
+        finally:
+            close_old_connections()
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        return sorted(executor.map(request, range(WORKERS)))
+
+
+@pytest.fixture
+def endpoints(recipe, author):
+    return (
+        (f'/api/recipes/{recipe.id}/favorite/', FavoritesList,
+         {'recipe': recipe}),
+        (f'/api/recipes/{recipe.id}/shopping_cart/', ShoppingList,
+         {'recipe': recipe}),
+        (f'/api/users/{author.id}/subscribe/', Follow, {'author': author}),
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('index', range(3),
+                         ids=('favorite', 'shopping_cart', 'subscribe'))
+def test_concurrent_toggles(user, recipe, author, endpoints, index):
+    """
+    Из одновременных одинаковых запросов успешен ровно один, остальные
+    получают 400, строка связи одна, счетчик совпадает с числом строк.
+    """
+    url, model, target = endpoints[index]
+    for method, success, expected in (('post', 200, 1),
+                                      ('delete', 204, 0),
+                                      ('post', 200, 1)):
+        statuses = fire(user, method, url)
+        assert statuses == sorted([success] + [400] * (WORKERS - 1))
+        assert model.objects.filter(user=user, **target).count() == expected
+        recipe.refresh_from_db()
+        author.refresh_from_db()
+        counter = {
+            FavoritesList: recipe.favorites_count,
+            ShoppingList: recipe.shopping_count,
+            Follow: author.followers_count,
+        }[model]
+        assert counter == expected
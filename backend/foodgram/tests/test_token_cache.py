@@ -0,0 +1,84 @@
+import pytest
+from api.cache import auth_token_key
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+ME = '/api/users/me/'
+
+
+@pytest.fixture(params=(False, True), ids=('local', 'shared'))
+def shared(request, settings):
+    settings.TOKEN_CACHE_SHARED = request.param
+
+
+@pytest.fixture
+def token(user):
+    return Token.objects.create(user=user)
+
+
+@pytest.fixture
+def token_client(token):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def count_queries(client, url):
+    with CaptureQueriesContext(connection) as queries:
+        assert client.get(url).status_code == 200
+    return len(queries)
+
+
+def warm_up(client):
+    """
+    Первый запрос заводит версию токена, второй кеширует токен, третий
+    обходится без запроса токена к базе.
+    """
+    first = count_queries(client, ME)
+    count_queries(client, ME)
+    assert count_queries(client, ME) == first - 1
+
+
+def evict(token):
+    """Вытесняет версию токена из кеша, как это делает LocMem."""
+    cache.delete(f'version:{auth_token_key(token.key)}')
+
+
+def test_cached_token_skips_database(shared, token_client):
+    warm_up(token_client)
+
+
+@pytest.mark.parametrize('evicted', (False, True),
+                         ids=('current', 'evicted'))
+def test_logout_invalidates_cached_token(shared, token, token_client,
+                                         evicted):
+    warm_up(token_client)
+    assert token_client.post('/api/auth/token/logout/').status_code == 204
+    if evicted:
+        evict(token)
+    assert token_client.get(ME).status_code == 401
+
+
+@pytest.mark.parametrize('evicted', (False, True),
+                         ids=('current', 'evicted'))
+def test_deactivation_invalidates_cached_token(shared, user, token,
+                                               token_client, evicted):
+    warm_up(token_client)
+    user.is_active = False
+    user.save()
+    if evicted:
+        evict(token)
+    assert token_client.get(ME).status_code == 401
+
+
+def test_unknown_tokens_do_not_fill_cache(db, shared):
+    client = APIClient()
+    keys = [f'{index:040x}' for index in range(20)]
+    for key in keys:
+        client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+        assert client.get('/api/tags/').status_code == 401
+    assert all(cache.get(f'version:{auth_token_key(key)}') is None
+               for key in keys)
@@ -6,5 +6,8 @@ from .models import User
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
     """Настройки отображения модели User в интерфейсе админки."""
+    list_display = ('username', 'email', 'recipes_count',
+                    'followers_count', )
     list_filter = ('username', 'email', )
+    readonly_fields = ('recipes_count', 'followers_count', )
     empty_value_display = '-пусто-'
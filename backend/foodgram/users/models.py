@@ -16,6 +16,10 @@ class User(AbstractUser):
     shopping_list = models.ManyToManyField('recipes.Recipe',
                                            through='recipes.ShoppingList',
                                            verbose_name='Список покупок', )
+    recipes_count = models.PositiveIntegerField(
+        default=0, verbose_name='Количество рецептов', )
+    followers_count = models.PositiveIntegerField(
+        default=0, verbose_name='Количество подписчиков', )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']